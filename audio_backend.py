@@ -0,0 +1,261 @@
+import os
+import threading
+import time
+import logging
+import numpy as np
+
+# sounddevice (and PortAudio behind it) is only loaded when the first real
+# output stream is opened, so importing the audio modules stays cheap.
+_sd = None
+_sd_error = None
+
+
+def _sounddevice():
+    """Import sounddevice on first use; None when PortAudio is unavailable."""
+    global _sd, _sd_error
+    if _sd is None and _sd_error is None:
+        try:
+            import sounddevice
+            _sd = sounddevice
+        except (ImportError, OSError) as e:  # no PortAudio on headless CI boxes
+            _sd_error = e
+            logging.info(f"sounddevice unavailable ({e}); only the null audio sink can be used.")
+    return _sd
+
+
+class CallbackStop(Exception):
+    """Raised by a callback to end its stream."""
+
+
+class NullStatus:
+    """Stands in for sounddevice.CallbackFlags; the null sink only reports underflows."""
+    output_overflow = False
+    input_underflow = False
+    input_overflow = False
+    priming_output = False
+
+    def __init__(self, output_underflow=False):
+        self.output_underflow = output_underflow
+
+    def __bool__(self):
+        return self.output_underflow
+
+
+class NullOutputStream:
+    """sounddevice.OutputStream look-alike that discards the audio.
+
+    A background thread calls the callback with `blocksize` frames either at
+    the real-time rate or, with realtime=False, as fast as possible. With
+    autorun=False no thread is started and the owner drives the callback.
+    """
+
+    def __init__(self, samplerate, channels=1, callback=None, blocksize=0, latency=None,
+                 dtype="float32", realtime=True, autorun=True, **kwargs):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.callback = callback
+        self.blocksize = blocksize or 512
+        self.latency = latency if isinstance(latency, (int, float)) else 0.0
+        self.realtime = realtime
+        self.autorun = autorun
+        self.active = False
+        self.frames_rendered = 0
+        self._outdata = np.zeros((self.blocksize, channels), dtype=dtype)
+        self._thread = None
+
+    def start(self):
+        self.active = True
+        if not self.autorun:
+            return
+        self._thread = threading.Thread(target=self._run, name="null-audio", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.active = False
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+    abort = stop
+
+    def close(self):
+        self.stop()
+
+    def _run(self):
+        ok, underflow = NullStatus(), NullStatus(output_underflow=True)
+        period = self.blocksize / self.samplerate
+        next_time = time.perf_counter()
+        while self.active:
+            # A whole block behind schedule is what a sound card would report as an underflow
+            late = self.realtime and time.perf_counter() - next_time > period
+            if late:
+                next_time = time.perf_counter()
+            try:
+                self.callback(self._outdata, self.blocksize, None, underflow if late else ok)
+            except CallbackStop:
+                break
+            except Exception:
+                logging.exception("Audio callback failed")
+                break
+            self.frames_rendered += self.blocksize
+            if self.realtime:
+                next_time += period
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        self.active = False
+
+
+_use_null_sink = False
+_null_options = {}
+
+# (block size in frames, suggested device latency in seconds), safest last
+BLOCK_LEVELS = ((256, 0.010), (512, 0.025), (1024, 0.050), (2048, 0.100))
+DEADLINE = 0.8  # callback work above this share of the block period counts as a miss
+REVIEW_INTERVAL = 1.0  # seconds between adaptation decisions
+ESCALATE_AFTER = 3  # misses within one review interval that move to a safer level
+STABLE_SECONDS = 30.0  # trouble-free time before stepping back towards the configured level
+
+
+class StreamHealth:
+    """Xrun and callback-load counters, updated from the audio callback.
+
+    `load` is the callback's share of the block period (1.0 = it used the
+    whole deadline); `late` counts callbacks above DEADLINE.
+    """
+
+    def __init__(self):
+        self.callbacks = 0
+        self.underruns = 0
+        self.overflows = 0
+        self.late = 0
+        self.load = 0.0
+        self.peak_load = 0.0
+
+    def record(self, status, frames, elapsed, samplerate):
+        self.callbacks += 1
+        if status:
+            if status.output_underflow:
+                self.underruns += 1
+            if status.output_overflow:
+                self.overflows += 1
+        load = elapsed * samplerate / max(frames, 1)
+        self.load = load
+        if load > self.peak_load:
+            self.peak_load = load
+        if load > DEADLINE:
+            self.late += 1
+
+    @property
+    def misses(self):
+        return self.underruns + self.overflows + self.late
+
+
+class OutputPolicy:
+    """Block size and latency for new output streams, adapted to how they cope.
+
+    Owners open streams with `settings()` and a callback passed through
+    `timed()`, then call `review()` regularly from a non-audio thread. After
+    ESCALATE_AFTER misses (xruns or late callbacks) within REVIEW_INTERVAL it
+    moves one BLOCK_LEVELS step safer and returns True, which tells the
+    owner to reopen its stream; after STABLE_SECONDS without misses it steps
+    back, but never below the configured level. The level outlives streams,
+    so a pause/resume keeps what was learned.
+    """
+
+    def __init__(self, blocksize=512, adaptive=True):
+        self.base_level = min(range(len(BLOCK_LEVELS)), key=lambda i: abs(BLOCK_LEVELS[i][0] - blocksize))
+        self.level = self.base_level
+        self.adaptive = adaptive
+        self.health = StreamHealth()
+        self.changes = 0
+        self._seen_misses = 0
+        self._last_review = time.perf_counter()
+        self._stable_since = self._last_review
+
+    def settings(self):
+        blocksize, latency = BLOCK_LEVELS[self.level]
+        return {"blocksize": blocksize, "latency": latency}
+
+    def timed(self, callback, samplerate):
+        """Wrap `callback` so every call is timed and its status flags counted."""
+        health = self.health
+        clock = time.perf_counter
+
+        def wrapped(outdata, frames, time_info, status):
+            started = clock()
+            try:
+                callback(outdata, frames, time_info, status)
+            finally:
+                health.record(status, frames, clock() - started, samplerate)
+        return wrapped
+
+    def review(self, now=None):
+        """Decide on a level change; True means the caller should reopen its stream."""
+        now = time.perf_counter() if now is None else now
+        if now - self._last_review < REVIEW_INTERVAL:
+            return False
+        self._last_review = now
+        misses = self.health.misses - self._seen_misses
+        self._seen_misses = self.health.misses
+        if not self.adaptive:
+            return False
+        if misses:
+            self._stable_since = now
+            if misses >= ESCALATE_AFTER and self.level + 1 < len(BLOCK_LEVELS):
+                return self._step(+1, f"{misses} xruns/late callbacks in {REVIEW_INTERVAL:.0f} s", now)
+        elif self.level > self.base_level and now - self._stable_since >= STABLE_SECONDS:
+            return self._step(-1, f"stable for {STABLE_SECONDS:.0f} s", now)
+        return False
+
+    def _step(self, direction, reason, now):
+        self.level += direction
+        self.changes += 1
+        self._stable_since = now
+        blocksize, latency = BLOCK_LEVELS[self.level]
+        logging.info(f"Audio output: {blocksize} frames / {latency * 1000:.0f} ms ({reason})")
+        return True
+
+    def snapshot(self):
+        blocksize, latency = BLOCK_LEVELS[self.level]
+        h = self.health
+        return {"blocksize": blocksize, "latency": latency, "adaptive": self.adaptive, "changes": self.changes,
+                "callbacks": h.callbacks, "underruns": h.underruns, "overflows": h.overflows,
+                "late": h.late, "load": h.load, "peak_load": h.peak_load}
+
+    def status_text(self):
+        s = self.snapshot()
+        return (f"audio {s['blocksize']} fr/{s['latency'] * 1000:.0f} ms | xruns {s['underruns'] + s['overflows']}"
+                f" | late {s['late']} | load {s['load']:.0%} (peak {s['peak_load']:.0%})")
+
+
+def use_null_sink(enabled=True, realtime=True, autorun=True):
+    """Route all new output streams to NullOutputStream (for replay, CI and benchmarks)."""
+    global _use_null_sink
+    _use_null_sink = enabled
+    _null_options.update(realtime=realtime, autorun=autorun)
+
+
+# Global instance; MUSIC_CONTROL_AUDIO_BLOCK picks the starting level, MUSIC_CONTROL_AUDIO_ADAPTIVE=0 pins it
+output_policy = OutputPolicy(blocksize=int(os.environ.get("MUSIC_CONTROL_AUDIO_BLOCK", "512")),
+                             adaptive=os.environ.get("MUSIC_CONTROL_AUDIO_ADAPTIVE", "1") != "0")
+
+
+def open_output_stream(**kwargs):
+    """Create an output stream on the sound card, or a null sink if selected/unavailable."""
+    sd = None if _use_null_sink else _sounddevice()
+    if sd is None:
+        return NullOutputStream(**_null_options, **kwargs)
+    callback = kwargs.get("callback")
+    if callback is not None:
+        kwargs["callback"] = _stop_with(callback, sd.CallbackStop)
+    return sd.OutputStream(**kwargs)
+
+
+def _stop_with(callback, stop_exception):
+    # Callbacks raise our CallbackStop; sounddevice only recognises its own.
+    def wrapped(outdata, frames, time_info, status):
+        try:
+            callback(outdata, frames, time_info, status)
+        except CallbackStop:
+            raise stop_exception() from None
+    return wrapped
@@ -1,11 +1,36 @@
-import sounddevice as sd
-import soundfile as sf
+import os
 import numpy as np
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from audio_backend import open_output_stream, output_policy, CallbackStop
+from audio_stream import open_source
+from resampler import LinearResampler
+from time_stretch import WsolaStretcher
+from control import ControlBlock, SmoothedParam
+from latency import monitor
+
+MAX_BLOCK = 4096
+# Seconds of crossfade between playlist tracks; 0 switches gaplessly at the exact end sample
+DEFAULT_CROSSFADE = float(os.environ.get("MUSIC_CONTROL_CROSSFADE", "0"))
+MANUAL_FADE = 0.05  # next/previous gestures fade at least this long to avoid a click
+# Speed gesture changes tempo only (WSOLA) instead of tempo and pitch together
+DEFAULT_TIME_STRETCH = os.environ.get("MUSIC_CONTROL_TIME_STRETCH") == "1"
+
+
+class PlaylistTrack:
+    """One opened playlist entry: its source, a resampler to the engine rate and a time-stretcher."""
+
+    def __init__(self, index, source, engine_samplerate):
+        self.index = index
+        self.source = source
+        self.ratio = source.samplerate / engine_samplerate
+        self.resampler = LinearResampler(MAX_BLOCK, max_ratio=max(2.0, 1.5 * self.ratio + 0.5))
+        self.stretcher = WsolaStretcher(self.ratio)
+
 
 class AudioEditor:
-    def __init__(self):
-        self.data = None
+    def __init__(self, crossfade=DEFAULT_CROSSFADE, time_stretch=DEFAULT_TIME_STRETCH):
+        self.source = None
         self.samplerate = None
         self.stream = None
         self.volume = 1.0
@@ -14,17 +39,53 @@ class AudioEditor:
         self.is_paused = False
         self.playback_position = 0
         self.duration = 0.0
+        self.resampler = LinearResampler(MAX_BLOCK)
+        # Gesture side publishes targets here; the callback glides toward them per sample
+        self.controls = ControlBlock()
+        self.volume_param = None
+        self.rate_param = None
+        self._gains = np.zeros(MAX_BLOCK, dtype=np.float32)
+        self._rates = np.zeros(MAX_BLOCK, dtype=np.float64)
+        self._seen_seq = 0
+        self.muted = False
+        self._seek_to = None  # frame to jump to, applied by the audio callback
+        self.time_stretch = time_stretch  # requested mode; the callback switches at its next block
+        self._stretching = time_stretch  # mode the callback is rendering in
+
+        # Playlist: the next track is opened and decoded on a worker while the
+        # current one plays, then handed to the callback through `_queued`.
+        self.playlist = []
+        self.track_index = 0
+        self.crossfade = crossfade
+        self.track = None  # PlaylistTrack being played
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+        self._wanted = None  # index the prefetch worker should produce
+        self._prefetching = None  # Future of the running prefetch
+        self._queued = None  # PlaylistTrack ready for the callback to switch to
+        self._switch_to = None  # index requested by next/previous, switched in by the callback
+        self._needs_prefetch = False
+        self._retired = []  # sources the callback finished with, closed off the audio thread
+        self._outgoing = None  # PlaylistTrack fading out
+        self._fade_pos = 0
+        self._fade_frames = 0
+        self._track_rates = np.zeros(MAX_BLOCK, dtype=np.float64)
+        self._fade_gain = np.zeros(MAX_BLOCK, dtype=np.float32)
+        self._fade_buf = np.zeros(MAX_BLOCK, dtype=np.float32)
+        self._ramp = np.arange(MAX_BLOCK, dtype=np.float32)
 
     def load_audio(self, file_path):
-        """Load an audio file and ensure it's in mono format."""
-        data, samplerate = sf.read(file_path, dtype="float32")
-        if len(data.shape) > 1:
-            data = np.mean(data, axis=1)  # Convert stereo to mono
-        self.duration = len(data) / samplerate
-        return data, samplerate
+        """Open a mono source (cached or streaming) and wait until its first block is ready."""
+        try:
+            source = open_source(file_path)
+        except RuntimeError as e:
+            print(f"❌ Error: {e}")
+            return None
+        source.start()
+        source.wait_ready()
+        return source
 
     def start_playback(self, song):
-        """Start or resume audio playback."""
+        """Start or resume audio playback of one song or a playlist (list of paths)."""
         if self.is_paused:
             self.is_paused = False
             self.should_stop = False
@@ -34,40 +95,255 @@ class AudioEditor:
             return
 
         # Load song if it's a new playback
-        self.data, self.samplerate = self.load_audio(song)
-        if self.data is None:
+        self._close_tracks()
+        self.playlist = [song] if isinstance(song, str) else list(song)
+        source = self.load_audio(self.playlist[0]) if self.playlist else None
+        if source is None:
             print("❌ Error: Failed to load the song.")
             return
+        self.samplerate = source.samplerate
+        self._set_track(PlaylistTrack(0, source, self.samplerate))
+        self.volume_param = SmoothedParam(self.controls, "volume", self.volume, self.samplerate, max_frames=MAX_BLOCK)
+        self.rate_param = SmoothedParam(self.controls, "rate", self.freq_factor, self.samplerate,
+                                        time_constant=0.05, max_frames=MAX_BLOCK, dtype=np.float64)
+        self._prefetch(1)
 
         self.should_stop = False
-        self.playback_position = 0
         self.thread = threading.Thread(target=self.play_audio)
         self.thread.start()
         print("🎶 Playback started!")
 
+    def _set_track(self, track):
+        self.track = track
+        self.track_index = track.index
+        self.source = track.source
+        self.resampler = track.resampler
+        self.duration = track.source.duration
+        self.playback_position = track.resampler.position
+
+    def _prefetch(self, index):
+        """Open and pre-buffer playlist entry `index` on a worker thread."""
+        queued = self._queued
+        if queued is not None and queued.index == index:
+            return
+        if not 0 <= index < len(self.playlist) or self._wanted == index:
+            return
+        self._wanted = index
+        if queued is not None:
+            self._queued = None
+            self._retired.append(queued.source)
+        self._prefetching = self._executor.submit(self._load_track, index)
+
+    def _load_track(self, index):
+        source = self.load_audio(self.playlist[index])
+        if source is None:
+            self._skip(index)
+            return
+        if self._wanted != index or self.samplerate is None:
+            source.close()  # superseded while loading
+            return
+        self._queued = PlaylistTrack(index, source, self.samplerate)
+
+    def _skip(self, index):
+        """Move past playlist entry `index` after it failed to open."""
+        if self._wanted != index:
+            return
+        print(f"⚠️ Skipping {os.path.basename(self.playlist[index])}: it could not be opened.")
+        # Keep going forward; a failed previous-track request falls back to the track after this one
+        following = index + 1 if index > self.track_index else self.track_index + 1
+        if self._switch_to == index:
+            self._switch_to = following if index > self.track_index and following < len(self.playlist) else None
+        if following < len(self.playlist):
+            self._prefetch(following)
+        if self._wanted == index:
+            self._wanted = None
+
+    def _maintain(self):
+        """Housekeeping the callback cannot do itself: prefetching and closing sources."""
+        if self._needs_prefetch:
+            self._needs_prefetch = False
+            self._prefetch(self.track_index + 1)
+        while self._retired:
+            self._executor.submit(self._retired.pop().close)
+
+    def settle(self, timeout=30.0):
+        """Do the housekeeping and wait for any prefetch (offline rendering, between blocks)."""
+        self._maintain()
+        prefetching = self._prefetching
+        if prefetching is not None:
+            prefetching.result(timeout)
+
+    def next_track(self):
+        self._request_track(self.track_index + 1)
+
+    def previous_track(self):
+        """Back to the start of the track, or to the previous one when already near it."""
+        if self.get_progress()[0] > 3.0 or self.track_index == 0:
+            self.seek(0.0)
+        else:
+            self._request_track(self.track_index - 1)
+
+    def _request_track(self, index):
+        if not 0 <= index < len(self.playlist):
+            return
+        self._switch_to = index
+        self._prefetch(index)
+        print(f"⏭️ Track {index + 1}/{len(self.playlist)}: {os.path.basename(self.playlist[index])}")
+
+    def current_track(self):
+        """(index, playlist length, path) of the track being played."""
+        if not self.playlist:
+            return 0, 0, None
+        return self.track_index, len(self.playlist), self.playlist[self.track_index]
+
+    def render_block(self, out):
+        """Resample, scale and write the next len(out) frames into `out` in place."""
+        alive = True
+        if self.time_stretch != self._stretching:
+            self._switch_mode(self.time_stretch)
+        seek_to, self._seek_to = self._seek_to, None
+        if seek_to is not None:
+            self.source.seek(seek_to)
+            self.resampler.reset(seek_to)
+            self.track.stretcher.reset(seek_to)
+        for start in range(0, len(out), MAX_BLOCK):
+            chunk = out[start:start + MAX_BLOCK]
+            frames = len(chunk)
+            rates = self.rate_param.render(self._rates[:frames])
+            alive = self._render_tracks(chunk, rates)
+            gains = self.volume_param.render(self._gains[:frames])
+            np.multiply(chunk, gains, out=chunk)
+        self.playback_position = self.track.stretcher.position if self._stretching else self.resampler.position
+        return alive
+
+    def _switch_mode(self, stretching):
+        """Hand playback between resampling and time-stretching without losing the position."""
+        for track in (self.track, self._outgoing):
+            if track is None:
+                continue
+            if stretching:
+                track.stretcher.reset(track.resampler.position)
+            else:
+                # The stretcher has read ahead; go back to what was actually played
+                position = track.stretcher.position
+                track.source.seek(int(position))
+                track.resampler.reset(int(position))
+        self._stretching = stretching
+
+    def _render_tracks(self, out, rates):
+        """Current track (plus any track fading out), switching tracks inside the block."""
+        frames = len(out)
+        queued = self._queued
+        if queued is not None and self._outgoing is None:
+            if self._switch_to == queued.index:
+                self._start_fade(queued, max(self.crossfade, MANUAL_FADE))
+            elif queued.index > self.track_index:
+                left = self._frames_left()
+                if self.crossfade > 0 and left is not None and left <= self.crossfade * self.samplerate:
+                    self._start_fade(queued, self.crossfade)
+                else:
+                    # Gapless: play the current track until it runs dry, then the next one
+                    self._play(self.track, out, rates)
+                    split = self.track.stretcher.valid if self._stretching else self.track.resampler.valid
+                    if split < frames:
+                        self._switch(queued)
+                        self._play(self.track, out[split:], rates[split:])
+                    return True
+
+        alive = self._play(self.track, out, rates)
+        if self._outgoing is not None:
+            self._mix_fade(out, rates)
+        if not alive and self.track_index + 1 < len(self.playlist) and (
+                self._wanted is not None or self._needs_prefetch):
+            # The next track is still loading: keep the stream open and switch once it's queued
+            return True
+        return alive
+
+    def _play(self, track, out, rates):
+        if not len(out):
+            return True
+        if self._stretching:
+            return track.stretcher.process(out, rates, track.resampler, track.source)
+        track_rates = self._track_rates[:len(out)]
+        np.multiply(rates, track.ratio, out=track_rates)
+        return track.resampler.process_rates(out, track_rates, track.source)
+
+    def _frames_left(self):
+        """Output frames until the current track ends at the current speed; None until its length is known."""
+        end = self.source.end_frame
+        if end is None:
+            return None
+        position = self.track.stretcher.position if self._stretching else self.resampler.position
+        return (end - position) / max(self.rate_param.value * self.track.ratio, 1e-3)
+
+    def _switch(self, track):
+        previous = self.track
+        self._queued = None
+        self._wanted = None
+        if self._switch_to == track.index:
+            self._switch_to = None
+        self._set_track(track)
+        self._needs_prefetch = True
+        return previous
+
+    def _start_fade(self, track, seconds):
+        previous = self._switch(track)
+        self._outgoing = previous
+        self._fade_pos = 0
+        self._fade_frames = max(int(seconds * self.samplerate), 1)
+
+    def _mix_fade(self, out, rates):
+        """Blend the outgoing track under `out` (already holding the incoming one)."""
+        frames = len(out)
+        old = self._fade_buf[:frames]
+        self._play(self._outgoing, old, rates)
+        gain = self._fade_gain[:frames]
+        np.add(self._ramp[:frames], self._fade_pos, out=gain)
+        gain /= self._fade_frames
+        np.clip(gain, 0.0, 1.0, out=gain)
+        np.subtract(out, old, out=out)
+        np.multiply(out, gain, out=out)
+        np.add(out, old, out=out)  # old + (new - old) * gain
+        self._fade_pos += frames
+        if self._fade_pos >= self._fade_frames:
+            self._retired.append(self._outgoing.source)
+            self._outgoing = None
+
     def play_audio(self):
         """Real-time playback with volume & frequency control."""
         def callback(outdata, frames, time, status):
             if self.should_stop:
-                raise sd.CallbackStop()
-
-            total_samples = len(self.data)
-            new_indices = np.linspace(
-                self.playback_position,
-                self.playback_position + (frames * self.freq_factor),
-                frames).astype(int)
-
-            new_indices = np.clip(new_indices, 0, total_samples - 1)
-            resampled_audio = self.data[new_indices] * self.volume
-            outdata[:, 0] = resampled_audio
-            self.playback_position += int(frames * self.freq_factor)
+                raise CallbackStop()
 
-            if self.playback_position >= total_samples:
+            started = monitor.now()
+            self._record_pickup(started, frames)
+            if not self.render_block(outdata[:, 0]):
                 self.should_stop = True
+            monitor.since("audio_callback", started)
 
-        self.stream = sd.OutputStream(samplerate=self.samplerate, channels=1, callback=callback)
+        self.stream = open_output_stream(samplerate=self.samplerate, channels=1,
+                                         callback=output_policy.timed(callback, self.samplerate),
+                                         **output_policy.settings())
         self.stream.start()
 
+    def _review_output(self):
+        """Reopen the stream when the output policy changed block size/latency."""
+        if output_policy.review() and self.stream is not None and not self.should_stop:
+            self.stream.stop()
+            self.stream.close()
+            self.play_audio()
+
+    def _record_pickup(self, now, frames):
+        """Latency from the camera frame behind the newest volume target to this callback."""
+        entry = self.controls.entry("volume")
+        if entry is None or entry[2] == self._seen_seq:
+            return
+        self._seen_seq = entry[2]
+        pickup = now - entry[1]
+        monitor.record("param_pickup", pickup)
+        output_latency = (self.stream.latency if self.stream else 0.0) + frames / self.samplerate
+        monitor.record("motion_to_sound", pickup + output_latency)
+
     def toggle_play_pause(self):
         """Pause or resume playback."""
         if self.is_paused:
@@ -79,14 +355,44 @@ class AudioEditor:
                 self.stream.abort()
             print("⏸️ Paused playback.")
 
-    def update_audio(self, left_volume, right_value):
+    def update_audio(self, left_volume, right_value, timestamp=None):
         """Update volume & frequency in real-time."""
         self.volume = left_volume
         self.freq_factor = 0.5 + (right_value * 1.0)  # Adjusts frequency between 0.5x and 1.5x
+        self.controls.publish("volume", 0.0 if self.muted else self.volume, timestamp)
+        self.controls.publish("rate", self.freq_factor, timestamp)
+        self._maintain()
+        self._review_output()
+
+    def set_time_stretch(self, enabled):
+        """Speed changes tempo only (True) or tempo and pitch like a turntable (False)."""
+        self.time_stretch = enabled
+        print("🎼 Speed keeps pitch." if enabled else "💿 Speed changes pitch.")
+
+    def toggle_mute(self):
+        self.muted = not self.muted
+        self.controls.publish("volume", 0.0 if self.muted else self.volume)
+        print("🔇 Muted." if self.muted else "🔊 Unmuted.")
+
+    def seek(self, seconds):
+        """Jump to `seconds` into the track, at the start of the next audio block."""
+        if self.source is None:
+            return
+        frame = int(max(0.0, min(seconds, self.duration)) * self.source.samplerate)
+        self._seek_to = frame
+        self.playback_position = frame  # shown right away; the callback jumps on its next block
+
+    def skip(self, seconds):
+        """Seek relative to the current position."""
+        self.seek(self.get_progress()[0] + seconds)
+
+    def get_stream_health(self):
+        """Output block size/latency and xrun/callback-load counters (see OutputPolicy)."""
+        return output_policy.snapshot()
 
     def get_progress(self):
         """Returns current position and total duration in seconds."""
-        elapsed = self.playback_position / self.samplerate if self.samplerate else 0
+        elapsed = self.playback_position / self.source.samplerate if self.source else 0
         return elapsed, self.duration
 
     def stop_playback(self):
@@ -97,22 +403,61 @@ class AudioEditor:
         if self.stream:
             self.stream.stop()
             self.stream.close()
+        self._close_tracks()
         print("🛑 Playback stopped.")
 
-# Global instance
-editor = AudioEditor()
+    def _close_tracks(self):
+        self._wanted = self._switch_to = None
+        for track in (self.track, self._outgoing, self._queued):
+            if track is not None:
+                track.source.close()
+        for source in self._retired:
+            source.close()
+        self.track = self._outgoing = self._queued = None
+        self._retired = []
+        self.source = None
+
+# Global instance, created on first use so importing this module stays cheap
+editor = None
+
+def get_editor():
+    global editor
+    if editor is None:
+        editor = AudioEditor()
+    return editor
 
 def start_playback(song):
-    editor.start_playback(song)
+    get_editor().start_playback(song)
 
 def toggle_play_pause():
-    editor.toggle_play_pause()
+    get_editor().toggle_play_pause()
+
+def update_audio(left_volume, right_value, timestamp=None):
+    get_editor().update_audio(left_volume, right_value, timestamp)
 
-def update_audio(left_volume, right_value):
-    editor.update_audio(left_volume, right_value)
+def get_stream_health():
+    return get_editor().get_stream_health()
 
 def get_progress():
-    return editor.get_progress()
+    return get_editor().get_progress()
+
+def next_track():
+    get_editor().next_track()
+
+def previous_track():
+    get_editor().previous_track()
+
+def current_track():
+    return get_editor().current_track()
+
+def skip(seconds):
+    get_editor().skip(seconds)
+
+def toggle_mute():
+    get_editor().toggle_mute()
+
+def set_time_stretch(enabled):
+    get_editor().set_time_stretch(enabled)
 
 def stop_playback():
-    editor.stop_playback()
\ No newline at end of file
+    get_editor().stop_playback()
\ No newline at end of file
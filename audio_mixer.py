@@ -1,80 +1,396 @@
-import pygame
-import soundfile as sf
-import time
+import bisect
+import itertools
+import threading
+import numpy as np
+from audio_backend import open_output_stream, output_policy
+from audio_stream import open_source, track_duration
+from resampler import LinearResampler
+from control import ControlBlock, SmoothedParam
+from latency import monitor
+from beat_grid import beat_grids
+
+MAX_BLOCK = 4096
+MAX_PITCH = 0.08  # tempo sync changes deck speed (and pitch, like a turntable) by at most this much
+GRID_WAIT = 2.0  # seconds start_mixing waits for beat analysis still running
+
+
+class Deck:
+    """One looping track in the mix, resampled to the engine rate."""
+
+    def __init__(self, source, engine_samplerate, controls, index):
+        self.path = source.path
+        self.source = source
+        self.base_ratio = self.source.samplerate / engine_samplerate
+        self.ratio = self.base_ratio
+        self.speed = 1.0  # tempo-sync factor, see AudioMixer._sync
+        self.grid = None  # beat_grid.BeatGrid once analysed
+        self.resampler = LinearResampler(MAX_BLOCK, max_ratio=max(2.0, self.ratio * (1 + MAX_PITCH) + 1))
+        self.duration = self.source.duration
+        self.gain = SmoothedParam(controls, f"deck{index}.gain", 1.0, engine_samplerate, max_frames=MAX_BLOCK)
+
+    def start(self):
+        self.source.start()
+        self.source.wait_ready()
+
+    def position(self):
+        """Playback position in seconds, counted in source samples."""
+        frames = self.source.frames
+        return (self.resampler.position % frames) / self.source.samplerate if frames else 0.0
+
+    def set_speed(self, speed):
+        self.speed = speed
+        self.ratio = self.base_ratio * speed
+
+    def seek(self, seconds):
+        frame = int(seconds * self.source.samplerate) % max(self.source.frames, 1)
+        self.source.seek(frame)
+        self.resampler.reset(frame)
+
+    def close(self):
+        self.source.close()
+
 
 class AudioMixer:
-    def __init__(self):
-        pygame.mixer.init()
-        self.channel1 = None
-        self.channel2 = None
-        self.song1_path = None
-        self.song2_path = None
-        self.song1_start = None
-        self.song2_start = None
-        self.song1_duration = 0
-        self.song2_duration = 0
+    """Sums any number of decks into one sounddevice stream.
+
+    Control calls (pause, seek, gain, crossfade) are queued and applied inside
+    the callback at an exact output frame, so they are sample-accurate and
+    never race the audio thread. Progress comes from each deck's sample
+    counter rather than from the wall clock.
+
+    With beat grids (see beat_grid) the decks start in phase, tempo-matched
+    within MAX_PITCH, and with `quantize` the gesture actions (pause, skip,
+    mute) land on the next beat of deck 0. All beat arithmetic happens on
+    the calling thread; the callback only runs the scheduled event.
+    """
+
+    def __init__(self, quantize=True):
+        self.decks = []
+        self.controls = ControlBlock()
+        self.stream = None
+        self.samplerate = None
+        self.paused = False  # as rendered by the audio thread
+        self._paused_target = False  # as last requested; a quantized change applies later
+        self._paused_at = -1  # output frame of the last requested pause/resume
+        self.frame_counter = 0  # output frames rendered since start
+        self._pending = []  # (frame, sequence, action), kept in frame order by schedule()
+        self._pending_lock = threading.Lock()
+        self._sequence = itertools.count()  # events for the same frame run in the order scheduled
+        self._seen_seq = 0
+        self.muted = False
+        self._muted_target = False  # as last requested, like _paused_target
+        self._volumes = (0.0, 0.0)
+        self._deck_bufs = None
+        self._gains = None
+        self._mix = np.zeros(MAX_BLOCK, dtype=np.float32)
+        self.quantize = quantize
+        self.synced = False
+
+    def prepare(self, songs):
+        """Start beat analysis early (e.g. during calibration) so start_mixing finds the grids ready."""
+        for path in songs:
+            beat_grids.request(path)
 
     def start_mixing(self, songs):
-        if len(songs) != 2:
-            print("❌ Error: Please select exactly two songs for mixing.")
+        if not songs:
+            print("❌ Error: Please select at least one song for mixing.")
             return
 
-        pygame.mixer.quit()
-        pygame.mixer.init()
+        self.stop_mixing()
+        sources = [open_source(path, loop=True) for path in songs]
+        self.samplerate = sources[0].samplerate
+        self.decks = [Deck(source, self.samplerate, self.controls, i) for i, source in enumerate(sources)]
+        for deck, grid in zip(self.decks, beat_grids.wait(songs, GRID_WAIT)):
+            deck.grid = grid
+        self.synced = False
+        self._sync()
+        for deck in self.decks:
+            deck.start()
+        self._deck_bufs = np.zeros((len(self.decks), MAX_BLOCK), dtype=np.float32)
+        self._gains = np.zeros((len(self.decks), MAX_BLOCK), dtype=np.float32)
+        self.paused = self._paused_target = False
+        self._paused_at = -1
+        self.frame_counter = 0
+
+        self._open_stream()
+        print("🎵 Mixing started!")
 
-        self.channel1 = pygame.mixer.Channel(0)
-        self.channel2 = pygame.mixer.Channel(1)
+    def _open_stream(self):
+        self.stream = open_output_stream(samplerate=self.samplerate, channels=2,
+                                         callback=output_policy.timed(self._callback, self.samplerate),
+                                         **output_policy.settings())
+        self.stream.start()
 
-        self.song1_path = songs[0]
-        self.song2_path = songs[1]
+    def schedule(self, action, at_frame=None):
+        """Run `action()` on the audio thread at output frame `at_frame` (default: next block)."""
+        event = (at_frame if at_frame is not None else -1, next(self._sequence), action)
+        with self._pending_lock:
+            bisect.insort(self._pending, event)
 
-        song1 = pygame.mixer.Sound(self.song1_path)
-        song2 = pygame.mixer.Sound(self.song2_path)
+    def _take_event(self, now):
+        """(action due by output frame `now` or None, frame of the first pending event or None)."""
+        with self._pending_lock:
+            if not self._pending:
+                return None, None
+            frame, _, action = self._pending[0]
+            if frame > now:
+                return None, frame
+            self._pending.pop(0)
+            return action, frame
 
-        self.song1_start = time.time()
-        self.song2_start = time.time()
+    def _sync(self, live=False):
+        """Match every deck's tempo and beat phase to deck 0.
 
-        self.song1_duration = self.get_duration(self.song1_path)
-        self.song2_duration = self.get_duration(self.song2_path)
+        Before the stream starts the decks are positioned so that their beats
+        coincide with deck 0's from its first beat on. `live` re-aligns a
+        running mix instead, with one seek per deck on deck 0's next beat.
+        """
+        master = self.decks[0].grid if self.decks else None
+        if master is None or any(deck.grid is None for deck in self.decks):
+            return
+        lead = self.decks[0]
+        now = lead.position() if live else 0.0
+        frames_until = (master.next_beat(now) - now) * lead.source.samplerate / lead.ratio
+        for index, deck in enumerate(self.decks[1:], start=1):
+            speed = self._match_speed(master, deck.grid, index)
+            if live:
+                at_beat = deck.position() + frames_until * deck.ratio / deck.source.samplerate
+                target = deck.grid.nearest_beat(at_beat)
+                self.schedule(lambda deck=deck, speed=speed, target=target: (deck.set_speed(speed), deck.seek(target)),
+                              self.frame_counter + int(round(frames_until)))
+            else:
+                deck.set_speed(speed)
+                at_beat = frames_until * deck.ratio / deck.source.samplerate
+                deck.seek((deck.grid.first_beat - at_beat) % deck.grid.period)
+        self.synced = True
+        print(f"🥁 Decks synced to {master.bpm:.1f} BPM.")
 
-        self.channel1.play(song1, loops=-1)
-        self.channel2.play(song2, loops=-1)
-        print("🎵 Mixing started!")
+    def _match_speed(self, master, grid, index):
+        """Speed factor that brings `grid` to the master tempo (or a double/half of it)."""
+        speed = master.bpm / grid.bpm
+        while speed > 1.5:
+            speed /= 2  # e.g. 70 against 140 BPM: lock every other beat
+        while speed < 0.75:
+            speed *= 2
+        if abs(speed - 1.0) > MAX_PITCH:
+            print(f"🥁 Deck {index + 1} ({grid.bpm:.1f} BPM) is too far from {master.bpm:.1f} BPM to match tempo.")
+            return 1.0
+        return speed
+
+    def _deck_time(self, deck, at_frame=None):
+        """Deck position (source seconds) at output frame `at_frame` if it keeps playing."""
+        ahead = 0 if at_frame is None else max(at_frame - self.frame_counter, 0)
+        return deck.position() + ahead * deck.ratio / deck.source.samplerate
+
+    def next_beat_frame(self):
+        """Output frame of deck 0's next beat, or None when quantizing is off or impossible."""
+        if not self.quantize or self.paused or not self.decks or self.decks[0].grid is None:
+            return None
+        deck = self.decks[0]
+        now = deck.position()
+        frames = (deck.grid.next_beat(now) - now) * deck.source.samplerate / deck.ratio
+        return self.frame_counter + int(round(frames))
+
+    def update_mixing(self, left_volume, right_volume, timestamp=None):
+        if not self.synced and self.decks and all(beat_grids.get(deck.path) for deck in self.decks):
+            # Analysis finished after the start: adopt the grids and re-align on a beat
+            for deck in self.decks:
+                deck.grid = beat_grids.get(deck.path)
+            self._sync(live=True)
+        if output_policy.review() and self.stream is not None:
+            # Safer (or back to faster) block size: scheduled events and deck state carry over
+            self.stream.stop()
+            self.stream.close()
+            self._open_stream()
+        self._volumes = (left_volume, right_volume)
+        self._publish_gains(timestamp)
+
+    def _publish_gains(self, timestamp=None):
+        left_volume, right_volume = (0.0, 0.0) if self.muted else self._volumes
+        self.set_gain(0, left_volume, timestamp=timestamp)
+        self.set_gain(1, right_volume, timestamp=timestamp)
+
+    def toggle_mute(self):
+        muted = self._muted_target = not self._muted_target
+        def apply():
+            # Flipped on the audio thread so a quantized mute lands exactly on the beat
+            self.muted = muted
+            self._publish_gains()
+        at_frame = self.next_beat_frame()
+        if at_frame is None:
+            apply()
+        else:
+            self.schedule(apply, at_frame)
+        print("🔇 Muted." if muted else "🔊 Unmuted.")
+
+    def set_gain(self, index, value, ramp_seconds=0.0, at_frame=None, timestamp=None):
+        """Set a deck's gain target; with a ramp or start frame the change is scheduled exactly."""
+        if index >= len(self.decks):
+            return
+        if not ramp_seconds and at_frame is None:
+            # Smoothed per sample by the deck's SmoothedParam, no queueing needed
+            self.controls.publish(f"deck{index}.gain", value, timestamp)
+            return
+        deck = self.decks[index]
+        ramp_frames = int(ramp_seconds * self.samplerate) if self.samplerate else 0
+        self.schedule(lambda: deck.gain.ramp_to(value, ramp_frames), at_frame)
+
+    def crossfade(self, from_index, to_index, seconds, at_frame=None, level=1.0):
+        """Ramp one deck down to silence while another ramps up to `level`."""
+        self.set_gain(from_index, 0.0, seconds, at_frame)
+        self.set_gain(to_index, level, seconds, at_frame)
+
+    def seek(self, index, seconds, at_frame=None):
+        if index < len(self.decks):
+            deck = self.decks[index]
+            self.schedule(lambda: deck.seek(seconds), at_frame)
+
+    def skip(self, seconds, at_frame=None):
+        """Move every deck `seconds` forward (or back) from where it is.
+
+        Quantized, the jump happens on the next beat and each deck moves by a
+        whole number of its own beats, so synced decks stay in phase.
+        """
+        if at_frame is None:
+            at_frame = self.next_beat_frame()
+        for index, deck in enumerate(self.decks):
+            shift = seconds
+            if at_frame is not None and deck.grid is not None:
+                shift = round(seconds / deck.grid.period) * deck.grid.period
+            self.seek(index, self._deck_time(deck, at_frame) + shift, at_frame)
 
-    def update_mixing(self, left_volume, right_volume):
-        if self.channel1 and self.channel2:
-            self.channel1.set_volume(left_volume)
-            self.channel2.set_volume(right_volume)
+    def set_paused(self, paused, at_frame=None):
+        """Pause or resume at output frame `at_frame`; never before a change requested earlier."""
+        at_frame = max(-1 if at_frame is None else at_frame, self._paused_at)
+        self._paused_target = paused
+        self._paused_at = at_frame
+        def apply():
+            self.paused = paused
+        self.schedule(apply, at_frame)
+
+    def toggle_play_pause(self):
+        # Toggles the requested state, so a second toggle before the beat is not lost.
+        # Pausing waits for the beat; resuming is immediate (paused decks keep their phase)
+        paused = not self._paused_target
+        self.set_paused(paused, self.next_beat_frame() if paused else None)
+        print("⏸️ Mixing paused." if paused else "▶️ Mixing resumed!")
 
     def stop_mixing(self):
-        pygame.mixer.quit()
-        print("🛑 Mixing stopped.")
+        if self.stream:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        for deck in self.decks:
+            deck.close()
+        if self.decks:
+            print("🛑 Mixing stopped.")
+        self.decks = []
 
     def get_duration(self, path):
         try:
-            with sf.SoundFile(path) as f:
-                return len(f) / f.samplerate
+            return track_duration(path)
         except Exception as e:
             print(f"Error reading {path}: {e}")
             return 0
 
+    def get_stream_health(self):
+        """Output block size/latency and xrun/callback-load counters (see OutputPolicy)."""
+        return output_policy.snapshot()
+
     def get_progress(self):
-        """Returns elapsed time and duration for both songs."""
-        elapsed1 = time.time() - self.song1_start if self.song1_start else 0
-        elapsed2 = time.time() - self.song2_start if self.song2_start else 0
-        return (elapsed1, elapsed2), (self.song1_duration, self.song2_duration)
+        """Returns elapsed time and duration for every deck."""
+        return tuple(deck.position() for deck in self.decks), tuple(deck.duration for deck in self.decks)
+
+    def _callback(self, outdata, frames, time, status):
+        started = monitor.now()
+        self._record_pickup(started, frames)
+        self.render(outdata)
+        monitor.since("audio_callback", started)
+
+    def render(self, outdata):
+        """Mix the next len(outdata) stereo frames into `outdata` (the callback, or offline)."""
+        frames = len(outdata)
+        offset = 0
+        while offset < frames:
+            count = min(frames - offset, MAX_BLOCK)
+            self._render(outdata[offset:offset + count], count)
+            offset += count
+
+    def _record_pickup(self, now, frames):
+        entry = self.controls.entry("deck0.gain")
+        if entry is None or entry[2] == self._seen_seq:
+            return
+        self._seen_seq = entry[2]
+        pickup = now - entry[1]
+        monitor.record("param_pickup", pickup)
+        output_latency = (self.stream.latency if self.stream else 0.0) + frames / self.samplerate
+        monitor.record("motion_to_sound", pickup + output_latency)
 
-# Global instance
-mixer = AudioMixer()
+    def _render(self, outdata, frames):
+        """Render `frames` frames, splitting the block wherever an event is due."""
+        start = 0
+        while start < frames:
+            now = self.frame_counter
+            action, next_frame = self._take_event(now)
+            if action is not None:
+                action()  # run outside the lock: it may schedule more events
+                continue
+            end = frames if next_frame is None else min(frames, start + next_frame - now)
+            self._mix_segment(outdata[start:end], end - start)
+            self.frame_counter += end - start
+            start = end
+
+    def _mix_segment(self, outdata, frames):
+        if self.paused or not self.decks:
+            outdata.fill(0)
+            return
+
+        bufs = self._deck_bufs[:, :frames]
+        gains = self._gains[:, :frames]
+        for row, deck in enumerate(self.decks):
+            deck.resampler.process(bufs[row], deck.ratio, deck.source)
+            deck.gain.render(gains[row])
+
+        # Vectorized per-deck gain, then one sum over all decks
+        np.multiply(bufs, gains, out=bufs)
+        mix = self._mix[:frames]
+        np.sum(bufs, axis=0, out=mix)
+        outdata[:, 0] = mix
+        outdata[:, 1] = mix
+
+
+# Global instance, created on first use so importing this module stays cheap
+mixer = None
+
+def get_mixer():
+    global mixer
+    if mixer is None:
+        mixer = AudioMixer()
+    return mixer
+
+def prepare(songs):
+    get_mixer().prepare(songs)
 
 def start_mixing(songs):
-    mixer.start_mixing(songs)
+    get_mixer().start_mixing(songs)
+
+def update_mixing(left_volume, right_volume, timestamp=None):
+    get_mixer().update_mixing(left_volume, right_volume, timestamp)
 
-def update_mixing(left_volume, right_volume):
-    mixer.update_mixing(left_volume, right_volume)
+def toggle_play_pause():
+    get_mixer().toggle_play_pause()
 
 def stop_mixing():
-    mixer.stop_mixing()
+    get_mixer().stop_mixing()
 
 def get_progress():
-    return mixer.get_progress()
\ No newline at end of file
+    return get_mixer().get_progress()
+
+def get_stream_health():
+    return get_mixer().get_stream_health()
+
+def skip(seconds):
+    get_mixer().skip(seconds)
+
+def toggle_mute():
+    get_mixer().toggle_mute()
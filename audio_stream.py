@@ -0,0 +1,360 @@
+import threading
+import time
+import logging
+import numpy as np
+import soundfile as sf
+import pcm_cache
+
+
+class RingBuffer:
+    """Fixed-size mono float32 ring buffer for one producer and one consumer."""
+
+    def __init__(self, capacity):
+        self._buf = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self._read = 0
+        self._write = 0
+        self._lock = threading.Lock()
+        self.generation = 0  # bumped by clear() so stale writes can be rejected
+
+    @property
+    def available(self):
+        return self._write - self._read
+
+    @property
+    def space(self):
+        return self.capacity - self.available
+
+    def write(self, data, generation=None):
+        """Copy as much of `data` as fits. Returns the number of samples written.
+
+        Data decoded before the last clear() (an older `generation`) is dropped.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return 0
+            n = min(len(data), self.capacity - (self._write - self._read))
+            start = self._write % self.capacity
+            first = min(n, self.capacity - start)
+            self._buf[start:start + first] = data[:first]
+            self._buf[:n - first] = data[first:n]
+            self._write += n
+        return n
+
+    def read_into(self, out):
+        """Copy up to len(out) samples into `out`. Returns the number copied."""
+        with self._lock:
+            n = min(len(out), self._write - self._read)
+            start = self._read % self.capacity
+            first = min(n, self.capacity - start)
+            out[:first] = self._buf[start:start + first]
+            out[first:n] = self._buf[:n - first]
+            self._read += n
+        return n
+
+    def clear(self, data=None):
+        """Drop everything buffered, then start over with `data` (if given) in one step."""
+        with self._lock:
+            self._read = self._write = 0
+            self.generation += 1
+            if data is not None:
+                n = min(len(data), self.capacity)
+                self._buf[:n] = data[:n]
+                self._write = n
+
+
+class StreamingSource:
+    """Decodes an audio file block by block on a background thread.
+
+    Decoded blocks are downmixed to mono and pushed into a ring buffer holding
+    `buffer_seconds` of audio, so memory use does not depend on track length.
+    The consumer (the audio callback) pulls samples with `read_into`.
+
+    With a `cache_writer` the file is decoded ahead, as fast as it can be,
+    into the memory-mapped cache entry and the ring is fed from there. Seeking
+    (or looping) to anything already decoded is then a copy from the map
+    rather than another pass over the file, and the file is only ever read
+    once, front to back.
+    """
+
+    def __init__(self, path, block_frames=8192, buffer_seconds=5.0, loop=False, cache_writer=None):
+        info = sf.info(path)
+        self.path = path
+        self.samplerate = info.samplerate
+        self.frames = info.frames
+        self.channels = info.channels
+        self.duration = info.frames / info.samplerate
+        self.block_frames = block_frames
+        self.loop = loop
+        self.cache_writer = cache_writer
+        self.ring = RingBuffer(max(block_frames * 2, int(buffer_seconds * self.samplerate)))
+        self.position = 0  # frames handed to the consumer (keeps counting when looping)
+        self.eof = False
+        self.decoded = cache_writer.data if cache_writer else None  # decoded mono samples, if mapped
+        self.decoded_frames = 0
+        self._total = None  # frame count once the whole file has been decoded
+        self._block = np.zeros((block_frames, self.channels), dtype=np.float32)
+        self._mono = np.zeros(block_frames, dtype=np.float32)
+        self._ready = threading.Event()
+        self._running = False
+        self._seek_to = None
+        self._thread = None
+
+    @property
+    def exhausted(self):
+        return self.eof and self.ring.available == 0
+
+    @property
+    def end_frame(self):
+        """Exact frame count once the decoder has reached the end of the file, else None.
+
+        `frames` comes from sf.info, which can overstate the length of an MP3.
+        """
+        return self._total
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._decode_loop, name="decoder", daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout=5.0):
+        """Block until the first decoded block is buffered."""
+        return self._ready.wait(timeout)
+
+    def read_into(self, out):
+        """Fill `out` with the next samples. Returns the number of samples copied."""
+        n = self.ring.read_into(out)
+        self.position += n
+        return n
+
+    def seek(self, frame):
+        """Drop buffered audio and continue from `frame`.
+
+        Takes effect for the consumer immediately. When the decoded map
+        already covers `frame` the ring is refilled from it right here, so
+        playback carries on without a gap; otherwise the decoder refills it
+        from the new position on its next iteration.
+        """
+        frame = max(0, min(int(frame), self.frames))
+        decoded, available = self.decoded, self.decoded_frames
+        if decoded is not None and frame < available:
+            n = min(available - frame, self.block_frames * 2)
+            self._seek_to = frame + n  # the decoder carries on after what is refilled here
+            self.ring.clear(decoded[frame:frame + n])
+        else:
+            self._seek_to = frame  # must be visible before the ring generation changes
+            self.ring.clear()
+        self.position = frame
+        self.eof = False
+
+    def close(self):
+        self._running = False
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self.decoded = None
+        if self.cache_writer:
+            self.cache_writer.abort()
+            self.cache_writer = None
+
+    def _commit_cache(self, end):
+        # Only a complete, in-order decode of the file is worth keeping
+        writer, self.cache_writer = self.cache_writer, None
+        if writer and writer.written == end:
+            writer.commit()
+        elif writer:
+            writer.abort()
+
+    def _decode_loop(self):
+        try:
+            with sf.SoundFile(self.path) as f:
+                if self.decoded is not None:
+                    self._mapped_loop(f)
+                else:
+                    self._direct_loop(f)
+        except Exception as e:
+            logging.error(f"Decoding {self.path} failed: {e}")
+            self.eof = True
+            self._ready.set()
+
+    def _read_block(self, f):
+        """Decode the next block of `f` to mono; returns (offset, samples)."""
+        offset = f.tell()
+        block = f.read(self.block_frames, dtype="float32", always_2d=True, out=self._block)
+        mono = self._mono[:len(block)]
+        np.mean(block, axis=1, out=mono)  # Convert stereo to mono
+        return offset, mono
+
+    def _direct_loop(self, f):
+        """No cache: decode straight into the ring, paced by playback."""
+        while self._running:
+            generation = self.ring.generation
+            if self._seek_to is not None:
+                frame, self._seek_to = self._seek_to, None
+                f.seek(frame)
+                self.eof = False
+            if self.eof or self.ring.space < self.block_frames:
+                time.sleep(0.005)
+                continue
+            offset, mono = self._read_block(f)
+            n = len(mono)
+            if n:
+                if not self.ring.write(mono, generation) and self._seek_to is None:
+                    # A seek cleared the ring after we had already jumped
+                    # to its target; rewind so this block is not lost.
+                    f.seek(-n, sf.SEEK_CUR)
+                    continue
+                self._ready.set()
+            if n < self.block_frames:
+                self._total = offset + n
+                if self.loop:
+                    f.seek(0)
+                else:
+                    self.eof = True
+                self._ready.set()
+
+    def _mapped_loop(self, f):
+        """Decode the whole file ahead into the cache map; feed the ring from the map."""
+        read_pos = 0  # next frame to hand to the ring
+        while self._running:
+            generation = self.ring.generation
+            if self._seek_to is not None:
+                read_pos, self._seek_to = self._seek_to, None
+                self.eof = False
+            busy = False
+
+            decoded, available = self.decoded, self.decoded_frames
+            if read_pos < available and self.ring.space >= self.block_frames:
+                n = min(self.ring.space, available - read_pos, self.block_frames * 4)
+                if self.ring.write(decoded[read_pos:read_pos + n], generation):
+                    read_pos += n
+                    self._ready.set()
+                busy = True
+            elif self._total is not None and read_pos >= self._total:
+                if self.loop and self._total:
+                    read_pos = 0
+                    continue
+                self.eof = True
+                self._ready.set()
+
+            if self._total is None:
+                self._decode_ahead(f)
+                busy = True
+                if self.decoded is None:
+                    # The finished entry could not be mapped back: stream the rest directly
+                    f.seek(min(read_pos, self._total))
+                    self.eof = False
+                    return self._direct_loop(f)
+            if not busy:
+                time.sleep(0.005)
+
+    def _decode_ahead(self, f):
+        offset, mono = self._read_block(f)
+        n = len(mono)
+        writer = self.cache_writer
+        writer.write(offset, mono)
+        self.decoded_frames = writer.written
+        if n < self.block_frames:
+            self._total = offset + n
+            # Drop our view of the temporary file before it is renamed into place
+            self.decoded = None
+            self._commit_cache(self._total)
+            hit = writer.cache.lookup(self.path)
+            if hit is not None:
+                self.decoded = hit[0]
+                self.decoded_frames = len(hit[0])
+
+
+def open_source(path, loop=False, cache=None):
+    """Open `path` for playback: memory-mapped from the PCM cache when possible,
+    otherwise streamed from the file while the cache entry is filled in."""
+    cache = cache or pcm_cache.cache
+    hit = cache.lookup(path)
+    if hit is not None:
+        data, meta = hit
+        return ArraySource(data, meta["samplerate"], loop=loop, path=path)
+    info = sf.info(path)
+    writer = cache.writer(path, info.frames, info.samplerate)
+    return StreamingSource(path, loop=loop, cache_writer=writer)
+
+
+def cache_track(path, cache=None, block_frames=1 << 16):
+    """Decode `path` into the PCM cache right away (if it isn't there yet); returns cache.lookup()."""
+    cache = cache or pcm_cache.cache
+    hit = cache.lookup(path)
+    if hit is not None:
+        return hit
+    info = sf.info(path)
+    writer = cache.writer(path, info.frames, info.samplerate)
+    if writer is None:
+        return None
+    # sf.info can overstate an MP3's length and sf.blocks pads a short final
+    # block with stale samples, so read until a short read and keep what was decoded
+    with sf.SoundFile(path) as f:
+        buffer = np.empty((block_frames, f.channels), dtype=np.float32)
+        mono = np.empty(block_frames, dtype=np.float32)
+        while True:
+            block = f.read(block_frames, dtype="float32", always_2d=True, out=buffer)
+            n = len(block)
+            np.mean(block, axis=1, out=mono[:n])
+            writer.write(writer.written, mono[:n])
+            if n < block_frames:
+                break
+    writer.commit()
+    return cache.lookup(path)
+
+
+def track_duration(path, cache=None):
+    """Track length in seconds, from cached metadata when available."""
+    meta = (cache or pcm_cache.cache).info(path)
+    if meta is not None:
+        return meta["frames"] / meta["samplerate"]
+    return sf.info(path).duration
+
+
+class ArraySource:
+    """In-memory (or memory-mapped) mono samples behind the StreamingSource interface."""
+
+    def __init__(self, data, samplerate, loop=False, path=None):
+        self.path = path
+        self.data = data
+        self.samplerate = samplerate
+        self.frames = len(data)
+        self.duration = self.frames / samplerate
+        self.loop = loop
+        self.position = 0
+        self.eof = False
+
+    @property
+    def exhausted(self):
+        return self.eof
+
+    @property
+    def end_frame(self):
+        return self.frames
+
+    def start(self):
+        pass
+
+    def wait_ready(self, timeout=None):
+        return True
+
+    def read_into(self, out):
+        n = 0
+        while n < len(out) and not self.eof:
+            count = min(len(out) - n, self.frames - self.position)
+            out[n:n + count] = self.data[self.position:self.position + count]
+            n += count
+            self.position += count
+            if self.position >= self.frames:
+                if self.loop and self.frames:
+                    self.position = 0
+                else:
+                    self.eof = True
+        return n
+
+    def seek(self, frame):
+        self.position = max(0, min(int(frame), self.frames))
+        self.eof = self.position >= self.frames and not self.loop
+
+    def close(self):
+        pass
@@ -0,0 +1,231 @@
+"""Record the control stream of a gesture session and render it to a file offline.
+
+    python automation.py render performance.npz mix.flac
+    python automation.py render performance.npz mix.wav --songs Songs/a.mp3 Songs/b.mp3
+
+An automation file is an .npz with the mode, the songs, the left/right
+control values HandTracker sent to the audio engine per frame and the
+gesture actions, all timestamped in seconds from the moment audio started.
+Record one with MUSIC_CONTROL_AUTOMATION=path.npz (UI), --record-automation
+(kiosk) or `replay.py play ... --automation path.npz`.
+
+Rendering drives a fresh AudioEditor/AudioMixer through the same
+render_block/render path the sound card callback uses, applying every value
+and action at its exact output frame, and streams the result to WAV/FLAC in
+large blocks as fast as the CPU allows.
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import numpy as np
+import soundfile as sf
+
+BLOCK_FRAMES = 1 << 16  # frames per file write
+
+
+class AutomationRecorder:
+    """Collects control values and gesture actions from HandTracker.process_frame."""
+
+    def __init__(self, path, mode, songs):
+        self.path = path
+        self.mode = mode
+        self.songs = list(songs)
+        self.start = None
+        self.end = None
+        self.times = []
+        self.values = []
+        self.action_times = []
+        self.actions = []
+
+    def begin(self, t):
+        """Audio started at perf_counter time `t`; everything is timed from here."""
+        self.start = t
+
+    def add(self, t, left, right):
+        if self.start is not None:
+            self.times.append(t - self.start)
+            self.values.append((left, right))
+            self.end = t
+
+    def add_action(self, t, name):
+        if self.start is not None:
+            self.action_times.append(t - self.start)
+            self.actions.append(name)
+
+    def close(self):
+        np.savez_compressed(
+            self.path,
+            mode=np.array(self.mode), songs=np.array(self.songs),
+            duration=np.array((self.end - self.start) if self.times else 0.0),
+            times=np.asarray(self.times, dtype=np.float64),
+            values=np.asarray(self.values, dtype=np.float32).reshape(-1, 2),
+            action_times=np.asarray(self.action_times, dtype=np.float64),
+            actions=np.array(self.actions, dtype=str))
+        logging.info(f"Recorded {len(self.times)} control frames and {len(self.actions)} actions to {self.path}")
+
+
+def load_automation(path):
+    with np.load(path) as f:
+        automation = {name: f[name] for name in f.files}
+    automation["mode"] = str(automation["mode"])
+    automation["songs"] = [str(song) for song in automation["songs"]]
+    automation["duration"] = float(automation["duration"])
+    return automation
+
+
+class _EditorTarget:
+    """Play mode: an AudioEditor whose 'callback' is called by the renderer."""
+
+    channels = 1
+
+    def __init__(self, songs):
+        from audio_editor import AudioEditor
+        self.editor = AudioEditor()
+        self.editor.start_playback(songs)
+        self.editor.thread.join()  # opens the (idle) null stream
+        self.samplerate = self.editor.samplerate
+        self.paused = False
+        self.finished = self.editor.track is None
+
+    def values(self, left, right):
+        self.editor.update_audio(left, right)
+
+    def action(self, name):
+        editor = self.editor
+        if name == "play_pause":
+            # Live, pausing stops the stream; offline the timeline keeps running silently
+            self.paused = not self.paused
+        elif name in ("seek_forward", "seek_backward"):
+            from hand_tracking import SEEK_STEP
+            editor.skip(SEEK_STEP if name == "seek_forward" else -SEEK_STEP)
+        elif name == "mute":
+            editor.toggle_mute()
+        elif name == "next_track":
+            editor.next_track()
+        elif name == "previous_track":
+            editor.previous_track()
+
+    def render(self, out):
+        self.editor.settle()
+        if self.paused or self.finished:
+            out.fill(0)
+        elif not self.editor.render_block(out[:, 0]):
+            self.finished = True
+
+    def close(self):
+        self.editor.stop_playback()
+
+
+class _MixerTarget:
+    """Mix mode: an AudioMixer rendered block by block; its own event queue handles actions."""
+
+    channels = 2
+    finished = False
+
+    def __init__(self, songs):
+        from audio_mixer import AudioMixer
+        self.mixer = AudioMixer()
+        self.mixer.start_mixing(songs)
+        self.samplerate = self.mixer.samplerate
+
+    def values(self, left, right):
+        self.mixer.update_mixing(left, right)
+
+    def action(self, name):
+        mixer = self.mixer
+        if name == "play_pause":
+            mixer.toggle_play_pause()
+        elif name in ("seek_forward", "seek_backward"):
+            from hand_tracking import SEEK_STEP
+            mixer.skip(SEEK_STEP if name == "seek_forward" else -SEEK_STEP)
+        elif name == "mute":
+            mixer.toggle_mute()
+
+    def render(self, out):
+        self.mixer.render(out)
+
+    def close(self):
+        self.mixer.stop_mixing()
+
+
+def render_automation(automation, out_path, songs=None, block_frames=BLOCK_FRAMES, subtype=None):
+    """Render `automation` (see load_automation) to `out_path`; returns (frames written, seconds taken).
+
+    Control values and actions are applied at their own output frame, so a
+    block is split wherever one falls; between them the engine renders
+    straight into the file buffer. Memory use is one block, whatever the
+    session length.
+    """
+    import audio_backend
+    from audio_stream import cache_track
+    audio_backend.use_null_sink(True, autorun=False)
+    songs = songs or automation["songs"]
+    for path in songs:
+        cache_track(path)  # memory-mapped sources: reads never run dry however fast we render
+
+    target = (_MixerTarget if automation["mode"] == "mix" else _EditorTarget)(songs)
+    samplerate = target.samplerate
+    # One merged, time-ordered list of (frame, kind, payload); as live, a frame's actions go before its values
+    events = [(int(round(t * samplerate)), 1, tuple(v)) for t, v in zip(automation["times"], automation["values"])]
+    events += [(int(round(t * samplerate)), 0, str(name))
+               for t, name in zip(automation["action_times"], automation["actions"])]
+    events.sort(key=lambda event: (event[0], event[1]))
+    total = int(round(automation["duration"] * samplerate))
+
+    buffer = np.zeros((block_frames, target.channels), dtype=np.float32)
+    started = time.perf_counter()
+    position = 0
+    next_event = 0
+    try:
+        with sf.SoundFile(out_path, "w", samplerate=samplerate, channels=target.channels, subtype=subtype) as f:
+            while position < total and not target.finished:
+                frames = min(block_frames, total - position)
+                block = buffer[:frames]
+                filled = 0
+                while filled < frames:
+                    while next_event < len(events) and events[next_event][0] <= position + filled:
+                        _, kind, payload = events[next_event]
+                        if kind == 0:
+                            target.action(payload)
+                        else:
+                            target.values(*payload)
+                        next_event += 1
+                    end = frames
+                    if next_event < len(events):
+                        end = min(frames, events[next_event][0] - position)
+                    target.render(block[filled:end])
+                    filled = end
+                f.write(block)
+                position += frames
+    finally:
+        target.close()
+    return position, time.perf_counter() - started
+
+
+def render(args):
+    automation = load_automation(args.automation)
+    frames, elapsed = render_automation(automation, args.output, songs=args.songs, subtype=args.subtype)
+    seconds = frames / max(sf.info(args.output).samplerate, 1)
+    print(f"Rendered {seconds:.1f}s of audio to {args.output} in {elapsed:.2f}s "
+          f"({seconds / max(elapsed, 1e-9):.0f}x real time)")
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Render recorded gesture automation to an audio file.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ren = sub.add_parser("render", help="render an automation .npz to WAV/FLAC")
+    ren.add_argument("automation")
+    ren.add_argument("output", help="output file; the format follows the extension (.wav, .flac)")
+    ren.add_argument("--songs", nargs="+", help="use these files instead of the recorded paths")
+    ren.add_argument("--subtype", help="soundfile subtype, e.g. PCM_24 or FLOAT")
+    args = parser.parse_args(argv)
+    if args.songs and not all(os.path.isfile(song) for song in args.songs):
+        parser.error("--songs: every file must exist")
+    render(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
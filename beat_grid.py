@@ -0,0 +1,273 @@
+import os
+import json
+import logging
+import threading
+import multiprocessing
+import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import soundfile as sf
+import pcm_cache
+
+HOP = 512
+N_FFT = 1024
+MIN_BPM, MAX_BPM = 60.0, 180.0
+PREFERRED_BPM = 120.0  # tempo prior: octave errors are resolved towards this
+REFINE, REFINE_STEPS = 0.02, 81  # +-2% around the autocorrelation tempo
+CHUNK_FRAMES = 2048  # spectrogram frames per FFT batch
+BLOCK_FRAMES = 1 << 16  # samples decoded at a time
+VERSION = 1
+
+
+class BeatGrid:
+    """Tempo and beat positions of a track: beat k is at `first_beat + k * period` seconds."""
+
+    def __init__(self, bpm, first_beat, duration, confidence=0.0):
+        self.bpm = bpm
+        self.period = 60.0 / bpm
+        self.first_beat = first_beat
+        self.duration = duration
+        self.confidence = confidence
+
+    @property
+    def beats(self):
+        return self.first_beat + self.period * np.arange(max(int((self.duration - self.first_beat) / self.period) + 1, 0))
+
+    def next_beat(self, seconds):
+        """Time of the first beat at or after `seconds`."""
+        k = np.ceil((seconds - self.first_beat) / self.period - 1e-9)
+        return float(self.first_beat + k * self.period)
+
+    def nearest_beat(self, seconds):
+        return float(self.first_beat + np.round((seconds - self.first_beat) / self.period) * self.period)
+
+    def phase(self, seconds):
+        """Fraction of a beat elapsed at `seconds` (0 on a beat)."""
+        return ((seconds - self.first_beat) / self.period) % 1.0
+
+    def to_dict(self):
+        return {"version": VERSION, "bpm": self.bpm, "first_beat": self.first_beat,
+                "duration": self.duration, "confidence": self.confidence}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["bpm"], data["first_beat"], data["duration"], data.get("confidence", 0.0))
+
+
+def _mono_blocks(path, cache, block_frames=BLOCK_FRAMES):
+    """Samplerate and an iterator over mono blocks of `path`: mapped from the PCM cache or decoded as it goes."""
+    hit = cache.lookup(path)
+    if hit is not None:
+        data, meta = hit
+        return meta["samplerate"], (data[start:start + block_frames] for start in range(0, len(data), block_frames))
+    return sf.info(path).samplerate, _decode_blocks(path, block_frames)
+
+
+def _decode_blocks(path, block_frames):
+    # Read until a short read: sf.info can overstate an MP3's length
+    with sf.SoundFile(path) as f:
+        buffer = np.empty((block_frames, f.channels), dtype=np.float32)
+        while True:
+            block = f.read(block_frames, dtype="float32", always_2d=True, out=buffer)
+            if len(block):
+                yield block.mean(axis=1, dtype=np.float32)
+            if len(block) < block_frames:
+                return
+
+
+def onset_envelope(blocks, samplerate):
+    """Spectral flux per hop: the summed increase in log magnitude across all bins.
+
+    `blocks` are consecutive mono sample arrays; spectra are computed
+    CHUNK_FRAMES at a time as the samples arrive, so memory use does not
+    depend on the track length. Returns (envelope, number of samples).
+    """
+    window = np.hanning(N_FFT).astype(np.float32)
+    pending = np.zeros(0, dtype=np.float32)  # samples from the start of the next spectrogram frame on
+    flux = []
+    previous = None
+    total = 0
+    blocks = iter(blocks)
+    finished = False
+    while not finished:
+        block = next(blocks, None)
+        if block is None:
+            finished = True
+        else:
+            total += len(block)
+            pending = np.concatenate([pending, block])
+        available = (len(pending) - N_FFT) // HOP + 1 if len(pending) >= N_FFT else 0
+        while available >= CHUNK_FRAMES or (finished and available):
+            count = min(available, CHUNK_FRAMES)
+            frames = np.lib.stride_tricks.sliding_window_view(pending[:(count - 1) * HOP + N_FFT], N_FFT)[::HOP]
+            spectrum = np.log1p(100.0 * np.abs(np.fft.rfft(frames * window, axis=1)))
+            if previous is not None:
+                spectrum = np.concatenate([previous, spectrum])
+            rise = np.diff(spectrum, axis=0)
+            np.maximum(rise, 0.0, out=rise)
+            flux.append(rise.sum(axis=1, dtype=np.float32))
+            previous = spectrum[-1:]
+            pending = pending[count * HOP:]
+            available -= count
+    flux = np.concatenate(flux) if flux else np.zeros(0, dtype=np.float32)
+    if len(flux) < 1:
+        return np.zeros(1, dtype=np.float32), total
+    # Remove the slowly varying loudness so only onsets remain
+    fps = samplerate / HOP
+    width = max(int(fps), 1)
+    local_mean = np.convolve(flux, np.ones(width, dtype=np.float32) / width, mode="same")
+    return np.maximum(flux - local_mean, 0.0), total
+
+
+def estimate_tempo(envelope, fps):
+    """BPM from the autocorrelation of the onset envelope; returns (bpm, confidence)."""
+    n = len(envelope)
+    lo = int(np.floor(fps * 60.0 / MAX_BPM))
+    hi = int(np.ceil(fps * 60.0 / MIN_BPM))
+    if n < hi * 4:
+        return PREFERRED_BPM, 0.0
+    centred = envelope - envelope.mean()
+    spectrum = np.fft.rfft(centred, 2 * n)
+    ac = np.fft.irfft(spectrum * np.conj(spectrum))[:n]
+    if ac[0] <= 0:
+        return PREFERRED_BPM, 0.0
+    lags = np.arange(lo, hi + 1)
+    bpms = 60.0 * fps / lags
+    prior = np.exp(-0.5 * np.log2(bpms / PREFERRED_BPM) ** 2)
+    score = ac[lags] * prior
+    best = int(np.argmax(score))
+    lag = float(lags[best])
+    if 0 < best < len(lags) - 1:
+        # Parabolic interpolation between neighbouring lags
+        a, b, c = ac[lags[best - 1]], ac[lags[best]], ac[lags[best + 1]]
+        denominator = a - 2 * b + c
+        if denominator < 0:
+            lag += 0.5 * (a - c) / denominator
+    return 60.0 * fps / lag, float(ac[lags[best]] / ac[0])
+
+
+def estimate_grid(envelope, period):
+    """Refine `period` and find the beat offset (both in envelope frames).
+
+    Every candidate period within REFINE of the autocorrelation estimate is
+    combined with every offset into one index array; the comb collecting the
+    most onset energy wins. A small period error adds up over a whole track,
+    so the period is refined together with the phase rather than before it.
+    """
+    periods = period * np.linspace(1.0 - REFINE, 1.0 + REFINE, REFINE_STEPS)
+    count = int((len(envelope) - 1) / periods[-1])
+    if count < 1:
+        return period, 0.0
+    offsets = np.arange(int(np.ceil(period)))
+    beats = np.arange(count)
+    positions = np.zeros((len(offsets), count), dtype=np.int64)
+    best_energy, best_period, best_offset = -1.0, period, 0.0
+    # One candidate period at a time: an (offsets x beats) index array, not periods x offsets x beats
+    for candidate in periods:
+        np.rint(offsets[:, None] + candidate * beats[None, :], out=positions, casting="unsafe")
+        np.clip(positions, 0, len(envelope) - 1, out=positions)
+        energy = envelope[positions].sum(axis=1)
+        best = int(np.argmax(energy))
+        if energy[best] > best_energy:
+            best_energy, best_period, best_offset = float(energy[best]), float(candidate), float(offsets[best])
+    return best_period, best_offset
+
+
+def analyze(path, cache_root=None):
+    """Onset envelope, tempo and beat grid of `path`. Runs in a worker process."""
+    cache = pcm_cache.PCMCache(cache_root) if cache_root else pcm_cache.cache
+    samplerate, blocks = _mono_blocks(path, cache)
+    fps = samplerate / HOP
+    envelope, frames = onset_envelope(blocks, samplerate)
+    bpm, confidence = estimate_tempo(envelope, fps)
+    period, offset = estimate_grid(envelope, fps * 60.0 / bpm)
+    # Flux frame i measures the change into spectrogram frame i + 1, timed at its window centre
+    first_beat = ((offset + 1) * HOP + N_FFT // 2) / samplerate
+    return BeatGrid(60.0 * fps / period, first_beat, frames / samplerate, confidence).to_dict()
+
+
+class BeatGridStore:
+    """Beat grids per track: cached as JSON beside the PCM cache, computed in a process pool.
+
+    `get()` never blocks; the first request for a track starts its analysis
+    in another process, so neither the GUI nor the audio callback pays for it.
+    """
+
+    def __init__(self, root=None, cache=None, workers=2):
+        self.cache_root = root or pcm_cache.DEFAULT_CACHE_DIR
+        self.root = os.path.join(self.cache_root, "beats")
+        self.cache = cache or pcm_cache.cache
+        self.workers = workers
+        self._grids = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _path(self, path):
+        return os.path.join(self.root, self.cache.key(path) + ".json")
+
+    def get(self, path):
+        grid = self._grids.get(path)
+        if grid is None:
+            self.request(path)
+        return grid
+
+    def request(self, path):
+        """Load the cached grid or start analysing `path`; returns a Future or None if loaded."""
+        with self._lock:
+            if path in self._grids or path in self._futures:
+                return self._futures.get(path)
+            try:
+                with open(self._path(path), encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == VERSION:
+                    self._grids[path] = BeatGrid.from_dict(data)
+                    return None
+            except (OSError, ValueError, KeyError):
+                pass
+            if self._executor is None:
+                # spawn: forking a process that already runs audio/camera threads is unsafe
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            future = self._executor.submit(analyze, path, self.cache_root)
+            future.add_done_callback(lambda done: self._store(path, done))
+            self._futures[path] = future
+            return future
+
+    def wait(self, paths, timeout=None):
+        """Grids for `paths` once analysed (None for any that failed or timed out).
+
+        `timeout` bounds the whole wait, not each track.
+        """
+        futures = {path: future for path, future in ((path, self.request(path)) for path in paths)
+                   if future is not None}
+        if futures:
+            concurrent.futures.wait(futures.values(), timeout)
+        for path, future in futures.items():
+            if path not in self._grids and future.done():
+                self._store(path, future)  # waiters wake before done-callbacks run
+        return [self._grids.get(path) for path in paths]
+
+    def _store(self, path, future):
+        try:
+            data = future.result()
+        except Exception as e:
+            logging.warning(f"Beat analysis of {path} failed: {e}")
+            return
+        grid = BeatGrid.from_dict(data)
+        self._grids[path] = grid
+        logging.info(f"{os.path.basename(path)}: {grid.bpm:.1f} BPM, first beat at {grid.first_beat:.3f} s")
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(self._path(path), "w", encoding="utf-8") as f:
+                json.dump(data, f)
+        except OSError as e:
+            logging.warning(f"Could not cache beat grid for {path}: {e}")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global instance
+beat_grids = BeatGridStore()
@@ -0,0 +1,71 @@
+"""Audio callback cost for the editor and the mixer on synthetic audio.
+
+Run from the repository root (no sound card needed):
+
+    python -m benchmarks.bench_audio
+
+Renders blocks through AudioEditor.render_block and AudioMixer's callback
+while the gesture targets keep changing, and reports the mean/p99 time per
+callback against the block deadline.
+"""
+import argparse
+import time
+import numpy as np
+import audio_backend
+from audio_editor import AudioEditor
+from audio_mixer import AudioMixer
+from benchmarks.common import synthetic_songs
+
+BLOCK_SIZES = (128, 256, 512, 1024)
+
+
+def time_blocks(render, frames, iterations, channels, on_block):
+    outdata = np.zeros((frames, channels), dtype=np.float32)
+    timings = np.zeros(iterations)
+    for i in range(iterations):
+        on_block(i)
+        start = time.perf_counter()
+        render(outdata, frames)
+        timings[i] = time.perf_counter() - start
+    return timings
+
+
+def run(iterations=1000, decks=2):
+    # Streams are created but never run; the benchmark drives the callbacks itself
+    audio_backend.use_null_sink(realtime=False, autorun=False)
+    results = []
+    with synthetic_songs(decks) as songs:
+        editor = AudioEditor()
+        editor.start_playback(songs[0])
+        editor.thread.join()
+        mixer = AudioMixer()
+        mixer.start_mixing(songs)
+
+        for frames in BLOCK_SIZES:
+            budget = frames / editor.samplerate
+            timings = time_blocks(lambda out, n: editor.render_block(out[:, 0]), frames, iterations, 1,
+                                  lambda i: editor.update_audio((i % 50) / 50, (i % 70) / 70))
+            results.append(("editor", frames, timings, budget))
+            timings = time_blocks(lambda out, n: mixer._callback(out, n, None, None), frames, iterations, 2,
+                                  lambda i: mixer.update_mixing((i % 50) / 50, (i % 70) / 70))
+            results.append((f"mixer x{decks}", frames, timings, budget))
+
+        editor.stop_playback()
+        mixer.stop_mixing()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--decks", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'engine':<10} {'block':>6} {'mean µs':>9} {'p99 µs':>9} {'budget %':>9}")
+    for name, frames, timings, budget in run(args.iterations, args.decks):
+        print(f"{name:<10} {frames:>6} {timings.mean() * 1e6:>9.1f} {np.percentile(timings, 99) * 1e6:>9.1f} "
+              f"{timings.mean() / budget * 100:>8.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Per-callback cost of the playback resampler.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_resampler
+
+Compares the old nearest-neighbour callback body with LinearResampler at
+common block sizes and reports the mean/p99 time per callback, the bytes of
+temporary memory allocated per callback (tracemalloc peak) and the number of
+NumPy buffers it allocates.
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+import numpy as np
+from audio_stream import ArraySource
+from resampler import LinearResampler
+
+SAMPLERATE = 44100
+BLOCK_SIZES = (64, 128, 256, 512, 1024, 2048)
+NUMPY_BUFFERS = [tracemalloc.DomainFilter(True, np.lib.tracemalloc_domain)]
+
+
+def legacy_callback(data, state, outdata, frames, freq_factor, volume):
+    """The pre-resampler play_audio body, kept for comparison."""
+    new_indices = np.linspace(
+        state["position"],
+        state["position"] + (frames * freq_factor),
+        frames).astype(int)
+    new_indices = np.clip(new_indices, 0, len(data) - 1)
+    outdata[:, 0] = data[new_indices] * volume
+    state["position"] += int(frames * freq_factor)
+    if state["position"] >= len(data):
+        state["position"] = 0
+
+
+def make_callbacks(data):
+    state = {"position": 0}
+    resampler = LinearResampler()
+    source = ArraySource(data, SAMPLERATE, loop=True)
+
+    def legacy(outdata, frames, freq_factor, volume):
+        legacy_callback(data, state, outdata, frames, freq_factor, volume)
+
+    def linear(outdata, frames, freq_factor, volume):
+        out = outdata[:, 0]
+        resampler.process(out, freq_factor, source)
+        np.multiply(out, volume, out=out)
+
+    return {"legacy": legacy, "linear": linear}
+
+
+def measure(callback, frames, iterations, freq_factor=1.23, volume=0.8):
+    outdata = np.zeros((frames, 1), dtype=np.float32)
+    for _ in range(50):
+        callback(outdata, frames, freq_factor, volume)
+
+    timings = np.zeros(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        callback(outdata, frames, freq_factor, volume)
+        timings[i] = time.perf_counter() - start
+
+    tracemalloc.start()
+    callback(outdata, frames, freq_factor, volume)
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    callback(outdata, frames, freq_factor, volume)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak - before, count_allocations(callback, outdata, frames, freq_factor, volume)
+
+
+def count_allocations(callback, *args):
+    """NumPy buffers allocated by one call.
+
+    Temporaries are freed before the call returns, so comparing snapshots
+    taken around it shows none. Instead the live buffers are counted at every
+    bytecode step (slow, so it is done once) and each increase is added up.
+    """
+    def live():
+        return len(tracemalloc.take_snapshot().filter_traces(NUMPY_BUFFERS).traces)
+
+    state = {"live": 0, "count": 0}
+
+    def trace(frame, event, arg):
+        frame.f_trace_opcodes = True
+        if event == "opcode":
+            n = live()
+            state["count"] += max(n - state["live"], 0)
+            state["live"] = n
+        return trace
+
+    tracemalloc.start()
+    state["live"] = live()
+    sys.settrace(trace)
+    try:
+        callback(*args)
+    finally:
+        sys.settrace(None)
+        tracemalloc.stop()
+    return state["count"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.uniform(-1, 1, SAMPLERATE * 30).astype(np.float32)
+
+    print(f"{'engine':<8} {'block':>6} {'mean µs':>9} {'p99 µs':>9} {'budget %':>9} {'alloc B':>9} {'allocs':>7}")
+    for frames in BLOCK_SIZES:
+        budget = frames / SAMPLERATE
+        for name, callback in make_callbacks(data).items():
+            timings, allocated, count = measure(callback, frames, args.iterations)
+            print(f"{name:<8} {frames:>6} {timings.mean() * 1e6:>9.1f} {np.percentile(timings, 99) * 1e6:>9.1f} "
+                  f"{timings.mean() / budget * 100:>8.2f}% {allocated:>9} {count:>7}")
+
+
+if __name__ == "__main__":
+    main()
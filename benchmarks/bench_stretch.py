@@ -0,0 +1,88 @@
+"""Per-callback cost of pitch-preserving time-stretch against plain resampling.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_stretch
+
+Renders blocks through WsolaStretcher (tempo only) and LinearResampler
+(tempo and pitch, the default speed gesture) at common block sizes and
+tempos, and reports the mean/p99 time per callback, its share of the
+callback budget and the bytes of temporary memory allocated per callback
+(tracemalloc peak).
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from audio_stream import ArraySource
+from resampler import LinearResampler
+from time_stretch import WsolaStretcher
+
+SAMPLERATE = 44100
+BLOCK_SIZES = (128, 256, 512, 1024, 2048)
+TEMPOS = (0.5, 0.8, 1.2, 1.5)
+
+
+def make_callbacks(data):
+    def resample():
+        resampler = LinearResampler()
+        source = ArraySource(data, SAMPLERATE, loop=True)
+        return lambda out, rates: resampler.process_rates(out, rates, source)
+
+    def wsola():
+        resampler = LinearResampler()
+        source = ArraySource(data, SAMPLERATE, loop=True)
+        stretcher = WsolaStretcher(1.0)
+        return lambda out, rates: stretcher.process(out, rates, resampler, source)
+
+    return {"resample": resample(), "wsola": wsola()}
+
+
+def measure(callback, frames, iterations, tempo=1.2):
+    out = np.zeros(frames, dtype=np.float32)
+    rates = np.full(frames, tempo, dtype=np.float64)  # as SmoothedParam renders them for the editor
+    for _ in range(50):
+        callback(out, rates)
+
+    timings = np.zeros(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        callback(out, rates)
+        timings[i] = time.perf_counter() - start
+
+    tracemalloc.start()
+    callback(out, rates)
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    callback(out, rates)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak - before
+
+
+def test_signal(seconds=30):
+    """A few harmonics plus noise, so the correlation search has real work to do."""
+    t = np.arange(SAMPLERATE * seconds) / SAMPLERATE
+    rng = np.random.default_rng(0)
+    tones = sum(np.sin(2 * np.pi * f * t) / (k + 1) for k, f in enumerate((110.0, 220.0, 330.0, 587.0)))
+    return (0.2 * tones + 0.05 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    data = test_signal()
+    print(f"{'engine':<9} {'tempo':>5} {'block':>6} {'mean µs':>9} {'p99 µs':>9} {'budget %':>9} {'alloc B':>9}")
+    for tempo in TEMPOS:
+        for frames in BLOCK_SIZES:
+            budget = frames / SAMPLERATE
+            for name, callback in make_callbacks(data).items():
+                timings, allocated = measure(callback, frames, args.iterations, tempo)
+                print(f"{name:<9} {tempo:>5.2f} {frames:>6} {timings.mean() * 1e6:>9.1f} "
+                      f"{np.percentile(timings, 99) * 1e6:>9.1f} {timings.mean() / budget * 100:>8.2f}% {allocated:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Hand tracker throughput and gesture decision latency from a replayed session.
+
+Run from the repository root (no camera or sound card needed):
+
+    python -m benchmarks.bench_tracker                 # synthetic landmarks
+    python -m benchmarks.bench_tracker --session s.npz --mediapipe
+
+Reports frames per second through HandTracker.process_frame and the
+per-stage timings collected by the latency monitor.
+"""
+import argparse
+from latency import monitor
+import audio_editor
+import audio_mixer
+import replay
+from benchmarks.common import synthetic_songs
+
+
+def run(session_path=None, mode="play", use_mediapipe=False, seconds=20.0, **tracker_options):
+    session = replay.load_session(session_path) if session_path else replay.synthetic_session(seconds)
+    with synthetic_songs(2 if mode == "mix" else 1) as songs:
+        monitor.reset()
+        tracker = replay.make_replay_tracker(session, mode, songs, use_mediapipe=use_mediapipe, **tracker_options)
+        count, elapsed = replay.run_replay(tracker, session)
+        if mode == "mix":
+            audio_mixer.stop_mixing()
+        else:
+            audio_editor.stop_playback()
+        tracker.cap.release()
+    summary = monitor.summary()
+    decision = [summary[stage]["p50_ms"] for stage in ("preprocess", "inference", "gesture")]
+    return {"frames": count, "seconds": elapsed, "fps": count / max(elapsed, 1e-9),
+            "decision_p50_ms": sum(decision), "stages": summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--session", help="recorded session .npz (default: synthetic)")
+    parser.add_argument("--mode", choices=("play", "mix"), default="play")
+    parser.add_argument("--mediapipe", action="store_true", help="run MediaPipe instead of replaying landmarks")
+    parser.add_argument("--frame-skip", action="store_true", help="predict landmarks between inferences")
+    args = parser.parse_args()
+
+    result = run(args.session, args.mode, args.mediapipe, frame_skip=args.frame_skip)
+    print(f"frames: {result['frames']}  fps: {result['fps']:.1f}  "
+          f"gesture decision p50: {result['decision_p50_ms']:.2f} ms")
+    print(monitor.overlay_text())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+import soundfile as sf
+import pcm_cache
+
+
+def synthetic_track(path, seconds=30.0, samplerate=44100):
+    t = np.arange(int(seconds * samplerate)) / samplerate
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 330 * t)
+    sf.write(path, np.stack([tone, tone], axis=1).astype(np.float32), samplerate)
+    return path
+
+
+@contextmanager
+def synthetic_songs(count, seconds=30.0):
+    """Temporary stereo test tones, with a throwaway PCM cache so the user's cache is untouched."""
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = pcm_cache.cache
+        pcm_cache.cache = pcm_cache.PCMCache(os.path.join(tmp, "cache"))
+        try:
+            yield [synthetic_track(os.path.join(tmp, f"deck{i}.wav"), seconds) for i in range(count)]
+        finally:
+            pcm_cache.cache = saved
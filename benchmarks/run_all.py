@@ -0,0 +1,63 @@
+"""Run every benchmark headlessly and optionally save the numbers for comparison.
+
+    python -m benchmarks.run_all --json results.json
+"""
+import argparse
+import json
+import platform
+import time
+import numpy as np
+from benchmarks import bench_audio, bench_resampler, bench_stretch, bench_tracker
+
+
+def summarize(timings, budget):
+    return {"mean_us": float(timings.mean() * 1e6), "p99_us": float(np.percentile(timings, 99) * 1e6),
+            "budget_pct": float(timings.mean() / budget * 100)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    results = {"created": time.time(), "python": platform.python_version(), "machine": platform.machine()}
+
+    tracker = bench_tracker.run()
+    results["tracker"] = {"fps": tracker["fps"], "decision_p50_ms": tracker["decision_p50_ms"]}
+    print(f"tracker: {tracker['fps']:.1f} fps, gesture decision p50 {tracker['decision_p50_ms']:.2f} ms")
+
+    results["audio"] = {}
+    for name, frames, timings, budget in bench_audio.run(args.iterations):
+        results["audio"][f"{name}@{frames}"] = summarize(timings, budget)
+        print(f"{name} @ {frames}: {timings.mean() * 1e6:.1f} µs mean ({timings.mean() / budget * 100:.2f}% of budget)")
+
+    data = np.random.default_rng(0).uniform(-1, 1, bench_resampler.SAMPLERATE * 30).astype(np.float32)
+    results["resampler"] = {}
+    for frames in bench_resampler.BLOCK_SIZES:
+        callback = bench_resampler.make_callbacks(data)["linear"]
+        timings, allocated, count = bench_resampler.measure(callback, frames, args.iterations)
+        entry = summarize(timings, frames / bench_resampler.SAMPLERATE)
+        entry["alloc_bytes"] = allocated
+        entry["allocs"] = count
+        results["resampler"][str(frames)] = entry
+        print(f"resampler @ {frames}: {timings.mean() * 1e6:.1f} µs mean, {allocated} B in {count} allocations")
+
+    data = bench_stretch.test_signal()
+    results["stretch"] = {}
+    for tempo in bench_stretch.TEMPOS:
+        for frames in bench_stretch.BLOCK_SIZES:
+            callback = bench_stretch.make_callbacks(data)["wsola"]
+            timings, allocated = bench_stretch.measure(callback, frames, args.iterations, tempo)
+            entry = summarize(timings, frames / bench_stretch.SAMPLERATE)
+            entry["alloc_bytes"] = allocated
+            results["stretch"][f"{tempo}@{frames}"] = entry
+        print(f"time-stretch x{tempo} @ 512: {results['stretch'][f'{tempo}@512']['mean_us']:.1f} µs mean")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import os
+import re
+import json
+import time
+import logging
+import numpy as np
+
+PROFILE_DIR = os.environ.get(
+    "MUSIC_CONTROL_PROFILE_DIR", os.path.join(os.path.expanduser("~"), ".config", "music-control", "profiles"))
+PROFILE_VERSION = 1
+PROFILE_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+class Calibrator:
+    """Incremental pinch/extend calibration fed one frame at a time.
+
+    Phases run in order: wait for both hands, collect pinched distances,
+    collect extended distances. Each phase lasts `phase_duration` seconds but
+    keeps going (up to `max_phase_duration`) until every hand has at least
+    `min_samples` readings. Ranges come from percentiles of the collected
+    samples so a single bad landmark frame cannot stretch them.
+    """
+
+    WAITING = "waiting"
+    PINCH = "pinch"
+    EXTEND = "extend"
+    DONE = "done"
+    HANDS = ("Left", "Right")
+
+    def __init__(self, phase_duration=3.0, max_phase_duration=10.0, min_samples=10,
+                 low_percentile=10, high_percentile=90):
+        self.phase_duration = phase_duration
+        self.max_phase_duration = max_phase_duration
+        self.min_samples = min_samples
+        self.low_percentile = low_percentile
+        self.high_percentile = high_percentile
+        self.phase = None
+        self.phase_start = None
+        self.samples = {}
+        self.ranges = None
+
+    @property
+    def active(self):
+        return self.phase is not None and self.phase != self.DONE
+
+    @property
+    def done(self):
+        return self.phase == self.DONE
+
+    def start(self, now=None):
+        self.phase = self.WAITING
+        self.phase_start = time.perf_counter() if now is None else now
+        self.samples = {phase: {hand: [] for hand in self.HANDS} for phase in (self.PINCH, self.EXTEND)}
+        self.ranges = None
+
+    def feed(self, distances, now=None):
+        """Feed one frame of index/thumb distances keyed by hand label.
+
+        Returns True on the frame that completes calibration.
+        """
+        if not self.active:
+            return False
+        now = time.perf_counter() if now is None else now
+
+        if self.phase == self.WAITING:
+            if all(hand in distances for hand in self.HANDS):
+                self._enter(self.PINCH, now)
+            return False
+
+        for hand, dist in distances.items():
+            if hand in self.HANDS:
+                self.samples[self.phase][hand].append(dist)
+
+        elapsed = now - self.phase_start
+        if elapsed < self.phase_duration:
+            return False
+        if elapsed < self.max_phase_duration and min(self.sample_counts().values()) < self.min_samples:
+            return False
+
+        if self.phase == self.PINCH:
+            self._enter(self.EXTEND, now)
+            return False
+        self.ranges = self._compute_ranges()
+        self.phase = self.DONE
+        return True
+
+    def progress(self, now=None):
+        """Fraction of the current phase elapsed, between 0 and 1."""
+        if self.phase in (self.PINCH, self.EXTEND):
+            now = time.perf_counter() if now is None else now
+            return min(1.0, (now - self.phase_start) / self.phase_duration)
+        return 1.0 if self.done else 0.0
+
+    def sample_counts(self):
+        """Samples collected per hand in the current phase."""
+        if self.phase not in (self.PINCH, self.EXTEND):
+            return {hand: 0 for hand in self.HANDS}
+        return {hand: len(values) for hand, values in self.samples[self.phase].items()}
+
+    def status_text(self):
+        if self.phase == self.WAITING:
+            return "🖐️ Calibrating... show both hands"
+        if self.phase in (self.PINCH, self.EXTEND):
+            action = "Pinch index and thumb" if self.phase == self.PINCH else "Spread index and thumb"
+            counts = self.sample_counts()
+            return (f"🖐️ {action} — {int(self.progress() * 100)}% "
+                    f"(L: {counts['Left']} / R: {counts['Right']} samples)")
+        if self.done:
+            return "✅ Calibration complete. Gesture control active!"
+        return ""
+
+    def _enter(self, phase, now):
+        self.phase = phase
+        self.phase_start = now
+
+    def _compute_ranges(self):
+        ranges = {}
+        for hand in self.HANDS:
+            pinched = self.samples[self.PINCH][hand]
+            extended = self.samples[self.EXTEND][hand]
+            if not pinched or not extended:
+                ranges[hand] = (None, None)
+                continue
+            low = float(np.percentile(pinched, self.low_percentile))
+            high = float(np.percentile(extended, self.high_percentile))
+            if high <= low:
+                high = low + 1e-3
+            ranges[hand] = (low, high)
+        return ranges
+
+
+class CalibrationProfile:
+    """A user's saved pinch ranges and the camera resolution they were measured at.
+
+    Distances are in normalized image coordinates, so ranges measured at one
+    aspect ratio do not carry over to another.
+    """
+
+    def __init__(self, name, ranges, resolution, updated=None):
+        self.name = name
+        self.ranges = {hand: tuple(ranges.get(hand, (None, None))) for hand in Calibrator.HANDS}
+        self.resolution = tuple(int(v) for v in resolution)
+        self.updated = time.time() if updated is None else updated
+
+    def matches(self, resolution):
+        return self.resolution == tuple(int(v) for v in resolution)
+
+    def to_dict(self):
+        return {"version": PROFILE_VERSION, "name": self.name, "updated": self.updated,
+                "resolution": list(self.resolution), "ranges": {hand: list(r) for hand, r in self.ranges.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data["ranges"], data["resolution"], data.get("updated"))
+
+
+def check_profile_name(name):
+    if not PROFILE_NAME.match(name):
+        raise ValueError(f"invalid profile name {name!r}: use letters, digits, '.', '_' or '-'")
+    return name
+
+
+def profile_path(name, root=None):
+    return os.path.join(root or PROFILE_DIR, check_profile_name(name) + ".json")
+
+
+def load_profile(name, root=None):
+    """The saved profile called `name`, or None if there is none (or it is unreadable)."""
+    try:
+        with open(profile_path(name, root), encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == PROFILE_VERSION:
+            return CalibrationProfile.from_dict(data)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logging.warning(f"Ignoring unreadable calibration profile {name!r}: {e}")
+    return None
+
+
+def save_profile(profile, root=None):
+    path = profile_path(profile.name, root)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(profile.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"Could not save calibration profile {profile.name!r}: {e}")
+
+
+class RangeRefiner:
+    """Adapts pinch ranges to the distances seen while the controller is in use.
+
+    Every distance goes into a fixed ring per hand; every `interval` seconds
+    the low/high percentiles of a hand's ring are blended into its range by
+    `rate`. A hand whose recent readings span less than `min_spread` of its
+    current range (held still, or barely used) is left alone, so the range
+    only follows real pinch and spread movement.
+    """
+
+    def __init__(self, ranges, window=1800, interval=2.0, rate=0.1, min_samples=300, min_spread=0.5,
+                 low_percentile=5, high_percentile=95):
+        self.ranges = dict(ranges)
+        self.window = window
+        self.interval = interval
+        self.rate = rate
+        self.min_samples = min_samples
+        self.min_spread = min_spread
+        self.percentiles = (low_percentile, high_percentile)
+        self.changed = False  # ranges moved since the profile was loaded or saved
+        self._values = {hand: np.zeros(window, dtype=np.float32) for hand in Calibrator.HANDS}
+        self._counts = {hand: 0 for hand in Calibrator.HANDS}
+        self._next_update = None
+
+    def feed(self, distances, now=None):
+        """Feed one frame of distances; returns True when the ranges were updated."""
+        now = time.perf_counter() if now is None else now
+        for hand, dist in distances.items():
+            if hand in self._values:
+                self._values[hand][self._counts[hand] % self.window] = dist
+                self._counts[hand] += 1
+        if self._next_update is None:
+            self._next_update = now + self.interval
+        if now < self._next_update:
+            return False
+        self._next_update = now + self.interval
+        updated = False
+        for hand in Calibrator.HANDS:
+            updated |= self._refine(hand)
+        self.changed |= updated
+        return updated
+
+    def _refine(self, hand):
+        low, high = self.ranges.get(hand, (None, None))
+        count = self._counts[hand]
+        if low is None or high is None or count < self.min_samples:
+            return False
+        seen_low, seen_high = np.percentile(self._values[hand][:min(count, self.window)], self.percentiles)
+        if seen_high - seen_low < self.min_spread * (high - low):
+            return False
+        low += self.rate * (float(seen_low) - low)
+        high += self.rate * (float(seen_high) - high)
+        self.ranges[hand] = (low, max(high, low + 1e-3))
+        return True
@@ -0,0 +1,88 @@
+import math
+import time
+import numpy as np
+
+
+class ControlBlock:
+    """Parameter targets shared between the gesture side and the audio callback.
+
+    Writers publish a new (value, timestamp, sequence) tuple per parameter.
+    Replacing a dict entry is atomic under the GIL, so the audio callback
+    reads the latest target without taking a lock and never sees a torn
+    update.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._seq = 0
+
+    def publish(self, name, value, timestamp=None):
+        self._seq += 1
+        self._entries[name] = (float(value), time.perf_counter() if timestamp is None else timestamp, self._seq)
+
+    def get(self, name, default=0.0):
+        entry = self._entries.get(name)
+        return entry[0] if entry is not None else default
+
+    def entry(self, name):
+        """Latest (value, timestamp, sequence) for `name`, or None."""
+        return self._entries.get(name)
+
+
+class SmoothedParam:
+    """Per-sample ramp from the current value toward a ControlBlock target.
+
+    By default the value follows the target with a one-pole exponential
+    glide of `time_constant` seconds. `ramp_to` instead starts an exact
+    linear ramp (used for crossfades) that ignores published targets until it
+    has finished. All ramps are written into caller-provided buffers using
+    precomputed decay curves, so rendering does not allocate.
+    """
+
+    def __init__(self, control, name, initial, samplerate, time_constant=0.02, max_frames=4096,
+                 dtype=np.float32, epsilon=1e-5):
+        self.control = control
+        self.name = name
+        self.value = float(initial)
+        self.epsilon = epsilon
+        self.max_frames = max_frames
+        self._ramp_step = 0.0
+        self._ramp_left = 0
+        self._ramp = np.arange(1, max_frames + 1, dtype=dtype)
+        coefficient = math.exp(-1.0 / max(time_constant * samplerate, 1e-9))
+        self._decay = np.power(coefficient, self._ramp, dtype=np.float64).astype(dtype)
+        control.publish(name, initial)
+
+    def ramp_to(self, target, frames):
+        """Move linearly to `target` over exactly `frames` samples."""
+        if frames <= 0:
+            self.value = float(target)
+            self._ramp_left = 0
+        else:
+            self._ramp_step = (target - self.value) / frames
+            self._ramp_left = frames
+        # Hold the end value afterwards instead of snapping back to an old target
+        self.control.publish(self.name, target)
+
+    def render(self, out):
+        """Fill `out` (at most max_frames long) with this block's per-sample values."""
+        frames = len(out)
+        if self._ramp_left:
+            n = min(frames, self._ramp_left)
+            np.multiply(self._ramp[:n], self._ramp_step, out=out[:n])
+            out[:n] += self.value
+            self._ramp_left -= n
+            self.value = float(out[n - 1])
+            out[n:] = self.value
+            return out
+
+        target = self.control.get(self.name, self.value)
+        diff = self.value - target
+        if abs(diff) < self.epsilon:
+            self.value = target
+            out.fill(target)
+            return out
+        np.multiply(self._decay[:frames], diff, out=out)
+        out += target
+        self.value = float(out[-1])
+        return out
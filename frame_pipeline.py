@@ -0,0 +1,103 @@
+import threading
+import logging
+from latency import monitor
+
+
+class LatestSlot:
+    """Single-item mailbox: a newer put() replaces whatever was not taken yet."""
+
+    def __init__(self):
+        self._item = None
+        self._has_item = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        """Store an item. Returns True if the slot was empty beforehand."""
+        with self._cond:
+            was_empty = not self._has_item
+            if not was_empty:
+                self.dropped += 1
+            self._item = item
+            self._has_item = True
+            self._cond.notify()
+            return was_empty
+
+    def get(self, timeout=None):
+        """Wait for the next item. Returns None on timeout or once closed."""
+        with self._cond:
+            if not self._has_item and not self._closed:
+                self._cond.wait(timeout)
+            if not self._has_item:
+                return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class FramePipeline:
+    """Camera capture and hand inference on two worker threads.
+
+    The capture thread only reads frames; the inference thread always works on
+    the most recent one, so a slow inference frame drops stale frames instead
+    of queueing them. Results are handed to `on_result` from the inference
+    thread as soon as they are ready.
+    """
+
+    def __init__(self, tracker, on_result):
+        self.tracker = tracker
+        self.on_result = on_result
+        self.frames = LatestSlot()
+        self._running = False
+        self._capture_thread = None
+        self._inference_thread = None
+
+    def start(self):
+        self._running = True
+        self._capture_thread = threading.Thread(target=self._capture_loop, name="capture", daemon=True)
+        self._inference_thread = threading.Thread(target=self._inference_loop, name="inference", daemon=True)
+        self._capture_thread.start()
+        self._inference_thread.start()
+
+    def stop(self):
+        self._running = False
+        self.frames.close()
+        for thread in (self._capture_thread, self._inference_thread):
+            if thread and thread is not threading.current_thread():
+                thread.join(timeout=1.0)
+
+    def _capture_loop(self):
+        while self._running:
+            started = monitor.now()
+            ret, frame = self.tracker.cap.read()
+            if not ret:
+                logging.warning("Camera frame could not be read; stopping capture.")
+                break
+            self.frames.put((frame, monitor.since("capture", started)))
+        self.frames.close()
+
+    def _inference_loop(self):
+        while self._running:
+            item = self.frames.get(timeout=0.5)
+            if item is None:
+                if self.frames.closed:
+                    break
+                continue
+            frame, captured_at = item
+            try:
+                result = self.tracker.process_frame(frame, captured_at)
+            except Exception:
+                logging.exception("Hand tracking failed on a frame")
+                continue
+            self.on_result(result)
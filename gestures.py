@@ -0,0 +1,201 @@
+import numpy as np
+from landmarks import NUM_LANDMARKS, LABELS
+
+HANDS = ("left", "right")
+FINGERS = ("thumb", "index", "middle", "ring", "pinky")
+TIPS = np.array([4, 8, 12, 16, 20])
+# (base, middle, tip) joints used for each finger's bend angle
+JOINTS = np.array([[2, 3, 4], [5, 6, 8], [9, 10, 12], [13, 14, 16], [17, 18, 20]])
+WRIST = 0
+
+
+def _feature_names():
+    names = []
+    for hand in HANDS:
+        names += [f"{hand}.pinch.{finger}" for finger in FINGERS[1:]]  # thumb tip to fingertip
+    names += [f"cross.{finger}" for finger in FINGERS]  # same fingertip, left hand to right hand
+    for hand in HANDS:
+        names += [f"{hand}.bend.{finger}" for finger in FINGERS]  # cosine: 1 straight, <0 folded
+    for hand in HANDS:
+        names += [f"{hand}.vx", f"{hand}.vy"]  # wrist velocity, image widths/heights per second
+    names += [f"{hand}.present" for hand in HANDS]
+    return tuple(names)
+
+
+FEATURES = _feature_names()
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURES)}
+
+# Indices into the flattened 10x10 fingertip distance matrix (rows: left tips, then right tips)
+_PINCH_PAIRS = [hand * 5 * 10 + hand * 5 + finger for hand in range(2) for finger in range(1, 5)]
+_CROSS_PAIRS = [finger * 10 + 5 + finger for finger in range(5)]
+_DISTANCE_PICKS = np.array(_PINCH_PAIRS + _CROSS_PAIRS)
+
+
+class Gesture:
+    """A named gesture: every condition `feature: (low, high)` must hold (None = unbounded).
+
+    `hold` is how long (seconds) the conditions must keep holding before it
+    fires; it then fires once per match, and not again within `cooldown`.
+    """
+
+    def __init__(self, name, conditions, hold=0.0, cooldown=1.0):
+        unknown = set(conditions) - set(FEATURE_INDEX)
+        if unknown:
+            raise ValueError(f"Unknown gesture features: {', '.join(sorted(unknown))}")
+        self.name = name
+        self.conditions = conditions
+        self.hold = hold
+        self.cooldown = cooldown
+
+
+FOLDED = (None, 0.3)
+STRAIGHT = (0.7, None)
+
+DEFAULT_GESTURES = (
+    # Middle fingertips of both hands touching
+    Gesture("play_pause", {"cross.middle": (None, 0.03)}, cooldown=1.0),
+    # Fast horizontal swipe of an open right hand
+    Gesture("seek_forward", {"right.vx": (2.0, None), "right.bend.middle": STRAIGHT,
+                             "right.bend.ring": STRAIGHT}, cooldown=0.5),
+    Gesture("seek_backward", {"right.vx": (None, -2.0), "right.bend.middle": STRAIGHT,
+                              "right.bend.ring": STRAIGHT}, cooldown=0.5),
+    # The same swipe with the left hand changes track (play mode playlist)
+    Gesture("next_track", {"left.vx": (2.0, None), "left.bend.middle": STRAIGHT,
+                           "left.bend.ring": STRAIGHT}, cooldown=0.8),
+    Gesture("previous_track", {"left.vx": (None, -2.0), "left.bend.middle": STRAIGHT,
+                               "left.bend.ring": STRAIGHT}, cooldown=0.8),
+    # Both hands closed into fists for a moment
+    Gesture("mute", {f"{hand}.bend.{finger}": FOLDED for hand in HANDS for finger in FINGERS[1:]},
+            hold=0.3, cooldown=1.0),
+)
+
+
+class GestureEngine:
+    """Landmarks as NumPy arrays, batched features and table-driven gesture matching.
+
+    `update()` copies each hand of a MediaPipe-style result into a reused
+    (2, 21, 3) array indexed by label (0 Left, 1 Right; NaN when absent) and
+    computes every feature in FEATURES with a handful of array operations.
+    `match()` evaluates all registered gestures at once: their conditions are
+    compiled into flat bound arrays, so adding a gesture adds no per-frame
+    Python work. Absent hands give NaN features, which fail every condition.
+    """
+
+    def __init__(self, gestures=DEFAULT_GESTURES, mirrored=True):
+        self.mirrored = mirrored  # False: landmarks come from an unflipped image (see HandTracker)
+        self.points = np.full((2, NUM_LANDMARKS, 3), np.nan, dtype=np.float32)
+        self.present = np.zeros(2, dtype=bool)
+        self.features = np.full(len(FEATURES), np.nan, dtype=np.float32)
+        self._prev_wrist = np.full((2, 2), np.nan, dtype=np.float32)
+        self._prev_time = None
+        self._tips = np.empty((10, 2), dtype=np.float32)
+        self._diff = np.empty((10, 10, 2), dtype=np.float32)
+        self._dist = np.empty((10, 10), dtype=np.float32)
+        self._seg = np.empty((2, 2, 5, 3), dtype=np.float32)
+        self._dot = np.empty((2, 5), dtype=np.float32)
+        self._norm = np.empty((2, 2, 5), dtype=np.float32)
+        self.gestures = []
+        for gesture in gestures:
+            self.register(gesture)
+
+    def register(self, gesture):
+        """Add (or replace, by name) a gesture and recompile the table."""
+        self.gestures = [g for g in self.gestures if g.name != gesture.name] + [gesture]
+        self._compile()
+
+    def _compile(self):
+        features, low, high, starts = [], [], [], []
+        for gesture in self.gestures:
+            starts.append(len(features))
+            for name, (lo, hi) in gesture.conditions.items():
+                features.append(FEATURE_INDEX[name])
+                low.append(-np.inf if lo is None else lo)
+                high.append(np.inf if hi is None else hi)
+        self._rule_features = np.array(features, dtype=np.intp)
+        self._rule_low = np.array(low, dtype=np.float32)
+        self._rule_high = np.array(high, dtype=np.float32)
+        self._rule_starts = np.array(starts, dtype=np.intp)
+        self._rule_values = np.empty(len(features), dtype=np.float32)
+        count = len(self.gestures)
+        self._hold = np.array([g.hold for g in self.gestures])
+        self._cooldown = np.array([g.cooldown for g in self.gestures])
+        self._since = np.full(count, np.nan)
+        self._fired = np.zeros(count, dtype=bool)
+        self._last_fired = np.full(count, -np.inf)
+
+    def update(self, result, t):
+        """Load the hands of `result` and recompute all features for time `t`."""
+        self.points.fill(np.nan)
+        self.present.fill(False)
+        if result.multi_hand_landmarks:
+            for hand_landmarks, handedness in zip(result.multi_hand_landmarks, result.multi_handedness):
+                slot = LABELS.index(handedness.classification[0].label)
+                if not self.mirrored:
+                    slot = 1 - slot  # MediaPipe labels assume a mirrored image
+                if self.present[slot]:
+                    continue
+                self.points[slot] = [(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark]
+                self.present[slot] = True
+            if not self.mirrored:
+                np.subtract(1.0, self.points[:, :, 0], out=self.points[:, :, 0])
+        self._compute(t)
+        return self.features
+
+    def _compute(self, t):
+        f = self.features
+        n_dist = len(_DISTANCE_PICKS)
+
+        # All fingertip-to-fingertip distances of both hands in one go
+        tips = self._tips.reshape(2, 5, 2)
+        np.copyto(tips, self.points[:, TIPS, :2])
+        np.subtract(self._tips[:, None], self._tips[None, :], out=self._diff)
+        np.multiply(self._diff, self._diff, out=self._diff)
+        np.sum(self._diff, axis=2, out=self._dist)
+        np.sqrt(self._dist, out=self._dist)
+        np.take(self._dist.ravel(), _DISTANCE_PICKS, out=f[:n_dist])
+
+        # Bend angle of every finger: cosine between its two segments
+        joints = self.points[:, JOINTS]  # (2, 5, 3, 3)
+        np.subtract(joints[:, :, 1], joints[:, :, 0], out=self._seg[0])
+        np.subtract(joints[:, :, 2], joints[:, :, 1], out=self._seg[1])
+        np.einsum("hfc,hfc->hf", self._seg[0], self._seg[1], out=self._dot)
+        np.sqrt(np.einsum("shfc,shfc->shf", self._seg, self._seg, out=self._norm), out=self._norm)
+        bend = f[n_dist:n_dist + 10].reshape(2, 5)
+        np.divide(self._dot, self._norm[0] * self._norm[1] + 1e-9, out=bend)
+
+        # Wrist velocity since the previous frame
+        velocity = f[n_dist + 10:n_dist + 14].reshape(2, 2)
+        wrist = self.points[:, WRIST, :2]
+        if self._prev_time is not None and t > self._prev_time:
+            np.subtract(wrist, self._prev_wrist, out=velocity)
+            velocity /= t - self._prev_time
+        else:
+            velocity.fill(np.nan)
+        np.copyto(self._prev_wrist, wrist)
+        self._prev_time = t
+
+        f[n_dist + 14:] = self.present
+
+    def feature(self, name):
+        return float(self.features[FEATURE_INDEX[name]])
+
+    def match(self, t):
+        """Names of the gestures that fire at time `t`, from the last update()."""
+        if not self.gestures:
+            return []
+        values = np.take(self.features, self._rule_features, out=self._rule_values)
+        ok = (values >= self._rule_low) & (values <= self._rule_high)
+        matched = np.logical_and.reduceat(ok, self._rule_starts)
+
+        starting = matched & np.isnan(self._since)
+        self._since[starting] = t
+        self._since[~matched] = np.nan
+        self._fired[~matched] = False
+        ready = (matched & ~self._fired & (t - self._since >= self._hold)
+                 & (t - self._last_fired >= self._cooldown))
+        if not ready.any():
+            return []
+        fired = np.flatnonzero(ready)
+        self._fired[fired] = True
+        self._last_fired[fired] = t
+        return [self.gestures[i].name for i in fired]
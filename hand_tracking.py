@@ -1,152 +1,298 @@
 import sys
-import cv2
-import mediapipe as mp
 import math
 import time
 import logging
 import numpy as np
 import audio_mixer
 import audio_editor
+from calibration import (Calibrator, CalibrationProfile, RangeRefiner, check_profile_name, load_profile,
+                         save_profile)
+from latency import monitor
+from roi_inference import RoiHandDetector
+from inference_worker import RemoteHands
+from landmark_filter import SkippingHandDetector
+from landmarks import LABELS, create_hands
+from gestures import GestureEngine, FEATURE_INDEX
+from beat_grid import beat_grids
+
+# Index-to-thumb pinch distance of each hand, by label slot
+PINCH_FEATURES = (FEATURE_INDEX["left.pinch.index"], FEATURE_INDEX["right.pinch.index"])
+SEEK_STEP = 10.0  # seconds per seek gesture
 
 logging.basicConfig(level=logging.INFO)
 
+
 class HandTracker:
-    def __init__(self, mode, songs, window_size):
+    def __init__(self, mode, songs, window_size, capture=None, hands=None, inference_budget=None,
+                 frame_skip=False, mirror=True, inference_process=False, profile=None):
+        """`capture` and `hands` replace the webcam and the MediaPipe model (e.g. for replay).
+
+        With `inference_budget` (seconds per frame) inference runs on an
+        adaptive, downscaled crop around the hands; see RoiHandDetector.
+        With `frame_skip` inference is skipped on frames where the landmarks
+        can be predicted (see SkippingHandDetector); its One-Euro smoothing of
+        the landmarks also smooths the pinch distances computed from them.
+        With `mirror=False` (headless use) the frame is not flipped: only the
+        colour conversion inference needs is done, and the GestureEngine
+        mirrors the landmarks (x and handedness) instead.
+        With `inference_process` MediaPipe runs in a worker process fed
+        through shared memory (see inference_worker.RemoteHands).
+        With `profile` (a name) calibration results are saved under that name
+        and reused on the next start, see begin_calibration.
+        """
         self.mode = mode
         self.songs = songs
         self.window_width, self.window_height = window_size
-        self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(min_detection_confidence=0.5, min_tracking_confidence=0.5)
-        self.cap = cv2.VideoCapture(0)
+        self.hands = hands or (RemoteHands() if inference_process else create_hands())
+        if inference_budget:
+            self.hands = RoiHandDetector(self.hands, budget=inference_budget)
+        self.frame_time = 0.0  # capture time of the frame being processed
+        self.draw_overlay = False  # draw fingertips into the frame itself (the UI draws its own)
+        self.mirror = mirror
+        self._rgb_buffers = []
+        self._rgb_index = 0
+        if frame_skip:
+            self.hands = SkippingHandDetector(self.hands, clock=lambda: self.frame_time)
+        if capture is None:
+            import cv2  # imported where used: importing this module (e.g. by the UI) stays cheap
+            capture = cv2.VideoCapture(0)
+        self.cap = capture
+        self.recorder = None  # replay.SessionRecorder, if this session is being recorded
+        self.automation = None  # automation.AutomationRecorder, if the control stream is being recorded
 
         self.left_min = self.left_max = None
         self.right_min = self.right_max = None
         self.should_quit = False
-        self.last_tap_time = 0
+        self.audio_started = False
+        self._start_pending = False  # a profile was loaded; the next process_frame starts audio
+        self.calibrator = Calibrator()
+        self.profile_name = check_profile_name(profile) if profile else None
+        self.profile = None  # calibration.CalibrationProfile in use
+        self.refiner = None  # calibration.RangeRefiner, while a profile is in use
+        self.gestures = GestureEngine(mirrored=mirror)
+        self.gesture_actions = self._gesture_actions()
+        if mode == "mix":
+            audio_mixer.prepare(songs)  # beat analysis runs while the user calibrates
 
     def calculate_distance(self, point1, point2):
         return math.sqrt((point1.x - point2.x)**2 + (point1.y - point2.y)**2)
 
+    def _gesture_actions(self):
+        """What each gesture in the GestureEngine table does in this mode."""
+        audio = audio_mixer if self.mode == "mix" else audio_editor
+        actions = {
+            "play_pause": audio.toggle_play_pause,
+            "seek_forward": lambda: audio.skip(SEEK_STEP),
+            "seek_backward": lambda: audio.skip(-SEEK_STEP),
+            "mute": audio.toggle_mute,
+        }
+        if self.mode == "play":
+            actions["next_track"] = audio_editor.next_track
+            actions["previous_track"] = audio_editor.previous_track
+        return actions
+
+    def begin_calibration(self, use_profile=True):
+        """Start calibrating from the regular frame stream (see process_frame).
+
+        If the saved profile was measured at this camera resolution its ranges
+        are used instead and audio starts with the next frame; they are
+        refined during use.
+        """
+        if use_profile and self._apply_profile():
+            return
+        self.calibrator.start()
+
+    def camera_resolution(self):
+        import cv2
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def _apply_profile(self):
+        if not self.profile_name:
+            return False
+        profile = load_profile(self.profile_name)
+        if profile is None:
+            logging.info(f"No calibration profile '{self.profile_name}' yet; calibrating.")
+            return False
+        resolution = self.camera_resolution()
+        if not profile.matches(resolution):
+            logging.info(f"Profile '{profile.name}' was calibrated at {profile.resolution[0]}x{profile.resolution[1]}, "
+                         f"the camera runs at {resolution[0]}x{resolution[1]}; calibrating.")
+            return False
+        self.profile = profile
+        self._use_ranges(profile.ranges)
+        logging.info(f"Loaded calibration profile '{profile.name}'.")
+        # Started by process_frame, like after calibrating, so it neither blocks the
+        # caller (the GUI thread) nor runs alongside the audio updates
+        self._start_pending = True
+        return True
+
     def calibrate_distances(self):
-        hands_detected = False
-        while not hands_detected:
-            ret, frame = self.cap.read()
-            if not ret:
-                break
-            rgb = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
-            result = self.hands.process(rgb)
-            hands_detected = bool(result.multi_hand_landmarks)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                self.should_quit = True
-                return
-
-        # Pinch Phase
-        left_min, right_min = float('inf'), float('inf')
-        start_time = time.time()
-        while time.time() - start_time < 3:
-            ret, frame = self.cap.read()
-            if not ret:
-                break
-            rgb = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
-            result = self.hands.process(rgb)
-            if result.multi_hand_landmarks:
-                for hand_landmarks, handedness in zip(result.multi_hand_landmarks, result.multi_handedness):
-                    dist = self.calculate_distance(
-                        hand_landmarks.landmark[8],  # Index
-                        hand_landmarks.landmark[4])  # Thumb
-                    if handedness.classification[0].label == "Left":
-                        left_min = min(left_min, dist)
-                    else:
-                        right_min = min(right_min, dist)
-
-        # Extend Phase
-        left_max, right_max = 0, 0
-        start_time = time.time()
-        while time.time() - start_time < 3:
+        """Blocking calibration straight from the camera, for use without a UI."""
+        self.begin_calibration()
+        while self.calibrator.active:
             ret, frame = self.cap.read()
             if not ret:
                 break
-            rgb = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
-            result = self.hands.process(rgb)
-            if result.multi_hand_landmarks:
-                for hand_landmarks, handedness in zip(result.multi_hand_landmarks, result.multi_handedness):
-                    dist = self.calculate_distance(
-                        hand_landmarks.landmark[8],
-                        hand_landmarks.landmark[4])
-                    if handedness.classification[0].label == "Left":
-                        left_max = max(left_max, dist)
-                    else:
-                        right_max = max(right_max, dist)
-
-        self.left_min, self.left_max = left_min, left_max
-        self.right_min, self.right_max = right_min, right_max
-        logging.info(f"Calibration Done — Left: min={left_min:.3f}, max={left_max:.3f} | Right: min={right_min:.3f}, max={right_max:.3f}")
+            self.process_frame(frame)
+
+    def _finish_calibration(self):
+        ranges = self.calibrator.ranges
+        self._use_ranges(ranges)
+        fmt = lambda v: f"{v:.3f}" if v is not None else "n/a"
+        logging.info(f"Calibration Done — Left: min={fmt(self.left_min)}, max={fmt(self.left_max)} | "
+                     f"Right: min={fmt(self.right_min)}, max={fmt(self.right_max)}")
+        if self.profile_name:
+            self.profile = CalibrationProfile(self.profile_name, ranges, self.camera_resolution())
+            save_profile(self.profile)
+        if not self.audio_started:
+            self.start_audio()
+
+    def _use_ranges(self, ranges):
+        self.left_min, self.left_max = ranges["Left"]
+        self.right_min, self.right_max = ranges["Right"]
+        if self.profile_name:
+            self.refiner = RangeRefiner(ranges)
 
     def start_audio(self):
+        self.audio_started = True
+        self._start_pending = False
+        started = time.perf_counter()
         if self.mode == "mix":
             audio_mixer.start_mixing(self.songs)
         else:
-            audio_editor.start_playback(self.songs[0])
+            audio_editor.start_playback(self.songs)
+        if self.automation:
+            # Starting blocks while the sources load (and, mixing, while beat analysis finishes),
+            # so the recording starts when it returns, on the frame clock (a replay's clock is its own)
+            self.automation.begin((self.frame_time or started) + time.perf_counter() - started)
 
-    def cleanup_and_exit(self):
+    def cleanup(self):
+        """Release the camera and model, stop audio and save what was recorded."""
         self.cap.release()
+        self.hands.close()  # also stops an inference worker process
+        if self.refiner and self.refiner.changed:
+            self.profile.ranges = dict(self.refiner.ranges)
+            self.profile.updated = time.time()
+            save_profile(self.profile)
+            logging.info(f"Saved refined calibration profile '{self.profile.name}'.")
+        if self.recorder:
+            self.recorder.close()
+        if self.automation:
+            self.automation.close()
         if self.mode == "mix":
             audio_mixer.stop_mixing()
+            beat_grids.shutdown()
         else:
             audio_editor.stop_playback()
+
+    def cleanup_and_exit(self):
+        self.cleanup()
         logging.info("Exited successfully.")
         sys.exit(0)
 
-    def process_frame(self, frame):
-        """Used by update_frame() in PyQt UI."""
+    def process_frame(self, frame, captured_at=None):
+        """Used by update_frame() in PyQt UI.
+
+        Returns the mirrored RGB frame, the left/right control values and the
+        fingertip positions for the overlay.
+
+        `captured_at` is the perf_counter time the frame was read; it is passed
+        on with the audio targets so motion-to-sound latency can be measured.
+        """
+        import cv2
+        started = monitor.now()
+        captured_at = started if captured_at is None else captured_at
+        self.frame_time = captured_at
+        raw_frame = frame
         left_volume = right_value = 0.0
-        frame = cv2.flip(frame, 1)
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # One conversion into a reused buffer; the same mirrored RGB image feeds
+        # inference and is handed to the UI for display.
+        rgb = self._next_rgb_buffer(frame.shape)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+        if self.mirror:
+            cv2.flip(rgb, 1, dst=rgb)
+        started = monitor.since("preprocess", started)
         result = self.hands.process(rgb)
+        started = monitor.since("inference", started)
+        if self.recorder:
+            self.recorder.add(captured_at, result, raw_frame)
 
-        left_middle = right_middle = None
+        # Landmarks become NumPy arrays once; every feature is computed in one batch
+        self.gestures.update(result, captured_at)
+        distances = {}
+        overlay = []  # normalized (index_tip, thumb_tip) pairs for the UI to draw
+        draw_time = 0.0
 
-        if result.multi_hand_landmarks:
-            for hand_landmarks, handedness in zip(result.multi_hand_landmarks, result.multi_handedness):
-                label = handedness.classification[0].label
-                index_tip = hand_landmarks.landmark[8]
-                thumb_tip = hand_landmarks.landmark[4]
-                dist = self.calculate_distance(index_tip, thumb_tip)
+        for slot, label in enumerate(LABELS):
+            if not self.gestures.present[slot]:
+                continue
+            points = self.gestures.points[slot]
+            index_tip = (float(points[8, 0]), float(points[8, 1]))
+            thumb_tip = (float(points[4, 0]), float(points[4, 1]))
+            dist = float(self.gestures.features[PINCH_FEATURES[slot]])
+            distances[label] = dist
 
+            overlay.append((index_tip, thumb_tip))
+            if self.draw_overlay and self.mirror:
                 # Draw landmarks (only index and thumb with a connecting line)
-                self.draw_index_thumb_line(frame, index_tip, thumb_tip)
-
-                if label == "Left" and self.left_min is not None and self.left_max is not None:
-                    norm = max(0.0, min(1.0, (dist - self.left_min) / (self.left_max - self.left_min)))
-                    left_volume = np.log10(1 + norm * 9)
-                    left_middle = hand_landmarks.landmark[12]
-
-                elif label == "Right" and self.right_min is not None and self.right_max is not None:
-                    norm = max(0.0, min(1.0, (dist - self.right_min) / (self.right_max - self.right_min)))
-                    right_value = np.log10(1 + norm * 9)
-                    right_middle = hand_landmarks.landmark[12]
-
-        # Detect tap gesture (middle fingers close)
-        if left_middle and right_middle:
-            tap_distance = self.calculate_distance(left_middle, right_middle)
-            if tap_distance < 0.03:
-                current_time = time.time()
-                if current_time - self.last_tap_time > 1:
-                    self.last_tap_time = current_time
-                    audio_editor.toggle_play_pause()
+                draw_start = monitor.now()
+                self.draw_index_thumb_line(rgb, index_tip, thumb_tip)
+                draw_time += monitor.now() - draw_start
+
+            if label == "Left" and self.left_min is not None and self.left_max is not None:
+                norm = max(0.0, min(1.0, (dist - self.left_min) / (self.left_max - self.left_min)))
+                left_volume = np.log10(1 + norm * 9)
+
+            elif label == "Right" and self.right_min is not None and self.right_max is not None:
+                norm = max(0.0, min(1.0, (dist - self.right_min) / (self.right_max - self.right_min)))
+                right_value = np.log10(1 + norm * 9)
+
+        if self.calibrator.active:
+            # Gestures stay inert until the ranges are known and audio is running.
+            if self.calibrator.feed(distances, captured_at):
+                self._finish_calibration()
+            return rgb, left_volume, right_value, overlay
+        if self._start_pending:
+            self.start_audio()
+            return rgb, left_volume, right_value, overlay
+        if self.refiner and self.refiner.feed(distances, captured_at):
+            self.left_min, self.left_max = self.refiner.ranges["Left"]
+            self.right_min, self.right_max = self.refiner.ranges["Right"]
+
+        # Discrete gestures (tap, swipe, fists) from the gesture table
+        for name in self.gestures.match(captured_at):
+            action = self.gesture_actions.get(name)
+            if action:
+                logging.info(f"Gesture: {name}")
+                if self.automation:
+                    self.automation.add_action(captured_at, name)
+                action()
 
         # Apply audio controls
         if self.mode == "mix":
-            audio_mixer.update_mixing(left_volume, right_value)
+            audio_mixer.update_mixing(left_volume, right_value, captured_at)
         else:
-            audio_editor.update_audio(left_volume, right_value)
+            audio_editor.update_audio(left_volume, right_value, captured_at)
+        if self.automation:
+            self.automation.add(captured_at, left_volume, right_value)
+
+        monitor.record("draw", draw_time)
+        monitor.record("gesture", monitor.now() - started - draw_time)
+        return rgb, left_volume, right_value, overlay
 
-        return frame, left_volume, right_value
+    def _next_rgb_buffer(self, shape):
+        # Rotate through a few buffers so the UI can still be painting the
+        # previous frame while this one is written.
+        if not self._rgb_buffers or self._rgb_buffers[0].shape != shape:
+            self._rgb_buffers = [np.empty(shape, dtype=np.uint8) for _ in range(3)]
+        self._rgb_index = (self._rgb_index + 1) % len(self._rgb_buffers)
+        return self._rgb_buffers[self._rgb_index]
 
     def draw_index_thumb_line(self, frame, index_tip, thumb_tip):
+        import cv2
         h, w, _ = frame.shape
-        index_pos = (int(index_tip.x * w), int(index_tip.y * h))
-        thumb_pos = (int(thumb_tip.x * w), int(thumb_tip.y * h))
+        index_pos = (int(index_tip[0] * w), int(index_tip[1] * h))
+        thumb_pos = (int(thumb_tip[0] * w), int(thumb_tip[1] * h))
         color = (255, 255, 255)
 
         # Draw fingertip outlines
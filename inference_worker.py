@@ -0,0 +1,188 @@
+import time
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from landmarks import MAX_HANDS, NUM_LANDMARKS, HandsResult, result_to_arrays, arrays_to_result, create_hands
+
+SLOTS = 2
+READY_TIMEOUT = 30.0  # importing MediaPipe and building the model in the worker
+RESULT_TIMEOUT = 2.0
+MAX_RESTARTS = 3  # worker restarts before hands are no longer reported
+POINTS_BYTES = MAX_HANDS * NUM_LANDMARKS * 3 * 4
+
+
+class FrameRing:
+    """Frame slots plus per-slot landmark results in one shared-memory block.
+
+    The parent writes RGB frames into the slots and the worker writes each
+    slot's (MAX_HANDS, 21, 3) points and labels back next to them, so neither
+    frames nor landmarks are ever pickled; only slot numbers cross the pipe.
+    """
+
+    def __init__(self, slots, frame_bytes, name=None):
+        self.slots = slots
+        self.frame_bytes = frame_bytes
+        size = slots * (frame_bytes + POINTS_BYTES + MAX_HANDS)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = _attach(name)
+        buf = self.shm.buf
+        offset = slots * frame_bytes
+        self.frames = np.ndarray((slots, frame_bytes), dtype=np.uint8, buffer=buf)
+        self.points = np.ndarray((slots, MAX_HANDS, NUM_LANDMARKS, 3), dtype=np.float32, buffer=buf, offset=offset)
+        self.labels = np.ndarray((slots, MAX_HANDS), dtype=np.int8, buffer=buf,
+                                 offset=offset + slots * POINTS_BYTES)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def frame(self, slot, shape):
+        return self.frames[slot, :int(np.prod(shape))].reshape(shape)
+
+    def close(self, unlink=False):
+        # The views must go before the mapping can be closed
+        self.frames = self.points = self.labels = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _attach(name):
+    """Open the parent's block; the parent alone unlinks it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13: the spawned worker shares the parent's resource tracker
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker_main(conn, factory):
+    """Inference process: run the model on every frame slot it is told about."""
+    hands = (factory or create_hands)()
+    ring = None
+    conn.send(("ready",))
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == "stop":
+                break
+            if message[0] == "ring":
+                if ring is not None:
+                    ring.close()
+                _, name, slots, frame_bytes = message
+                ring = FrameRing(slots, frame_bytes, name)
+                continue
+            _, seq, slot, shape = message
+            started = time.perf_counter()
+            result = hands.process(ring.frame(slot, shape))
+            result_to_arrays(result, ring.points[slot], ring.labels[slot])
+            conn.send(("done", seq, time.perf_counter() - started))
+    except (EOFError, KeyboardInterrupt):
+        pass  # parent went away
+    finally:
+        if ring is not None:
+            ring.close()
+        if hasattr(hands, "close"):
+            hands.close()
+
+
+class RemoteHands:
+    """Drop-in for mp Hands that runs inference in a separate process.
+
+    MediaPipe then no longer competes with drawing, Qt and the audio callback
+    for this interpreter's GIL. Frames go through a FrameRing; `process()`
+    copies the frame into the next slot, sends the slot number and waits for
+    the landmarks, releasing the GIL while it waits. The ring grows if a
+    larger frame arrives. If the worker dies or stops answering, that frame
+    has no hands and the worker is restarted, up to MAX_RESTARTS times;
+    after that hands are reported as absent.
+    `factory` builds the model in the worker (default: create_hands); it
+    must be picklable, i.e. a module-level function.
+    """
+
+    def __init__(self, factory=None, slots=SLOTS):
+        self.factory = factory
+        self.slots = slots
+        self.worker_time = 0.0  # inference time inside the worker, last frame
+        self.failed = False
+        self.restarts = 0
+        self._process = None
+        self._conn = None
+        self._ring = None
+        self._ready = False
+        self._slot = 0
+        self._seq = 0
+
+    def start(self):
+        """Start the worker; the model is built there while this process carries on."""
+        if self._process is not None:
+            return
+        context = multiprocessing.get_context("spawn")
+        self._conn, child = context.Pipe()
+        self._process = context.Process(target=_worker_main, args=(child, self.factory),
+                                        name="hand-inference", daemon=True)
+        self._process.start()
+        child.close()
+
+    def process(self, rgb):
+        if self.failed:
+            return HandsResult()
+        self.start()
+        try:
+            if not self._ready:
+                self._receive(READY_TIMEOUT)
+                self._ready = True
+            slot = self._submit(rgb)
+            self.worker_time = self._receive(RESULT_TIMEOUT)[2]
+            return arrays_to_result(self._ring.points[slot], self._ring.labels[slot])
+        except (EOFError, OSError, TimeoutError) as e:
+            reason = str(e) or type(e).__name__
+            self.close()
+            if self.restarts >= MAX_RESTARTS:
+                self.failed = True
+                logging.error(f"Inference worker failed ({reason}); no more hands will be reported.")
+            else:
+                self.restarts += 1
+                logging.warning(f"Inference worker failed ({reason}); restarting it "
+                                f"({self.restarts}/{MAX_RESTARTS}).")
+            return HandsResult()
+
+    def _submit(self, rgb):
+        if self._ring is None or rgb.nbytes > self._ring.frame_bytes:
+            self._resize(rgb.nbytes)
+        self._slot = (self._slot + 1) % self.slots
+        np.copyto(self._ring.frame(self._slot, rgb.shape), rgb)
+        self._seq += 1
+        self._conn.send(("frame", self._seq, self._slot, rgb.shape))
+        return self._slot
+
+    def _resize(self, frame_bytes):
+        old = self._ring
+        self._ring = FrameRing(self.slots, frame_bytes)
+        self._conn.send(("ring", self._ring.name, self.slots, frame_bytes))
+        if old is not None:
+            old.close(unlink=True)  # the worker keeps its mapping until it switches
+
+    def _receive(self, timeout):
+        if not self._conn.poll(timeout):
+            raise TimeoutError(f"no reply within {timeout:.0f} s")
+        return self._conn.recv()
+
+    def close(self):
+        if self._process is not None:
+            try:
+                self._conn.send(("stop",))
+            except OSError:
+                pass
+            self._process.join(timeout=2.0)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join(timeout=1.0)
+            self._conn.close()
+            self._process = None
+            self._ready = False
+        if self._ring is not None:
+            self._ring.close(unlink=True)
+            self._ring = None
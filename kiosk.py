@@ -0,0 +1,148 @@
+"""Headless gesture music control: camera, hand tracking and audio, no display.
+
+For installations without a screen. Status goes to the log instead of a window:
+
+    python kiosk.py play Songs/track.mp3
+    python kiosk.py mix Songs/a.mp3 Songs/b.mp3 --frame-skip
+    python kiosk.py play Songs/track.mp3 --profile alice   # calibrate once, then start at once
+
+Frames are never drawn, scaled or mirrored; the tracker only converts them to
+RGB for inference (see HandTracker's `mirror` option). Stop with Ctrl+C or
+SIGTERM.
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import threading
+import cv2
+import hand_tracking
+import audio_editor
+import audio_mixer
+from frame_pipeline import FramePipeline
+from latency import monitor
+from audio_backend import output_policy
+from calibration import check_profile_name
+
+
+class KioskStatus:
+    """Collects tracker results on the inference thread and logs a summary periodically."""
+
+    def __init__(self, tracker, interval=5.0):
+        self.tracker = tracker
+        self.interval = interval
+        self.frames = 0
+        self.values = (0.0, 0.0)
+        self._last_status = None
+        self._last_frames = 0
+        self._last_time = time.perf_counter()
+
+    def on_result(self, result):
+        # Only the control values are kept; the frame is dropped right away
+        _, left_value, right_value, _ = result
+        self.values = (left_value, right_value)
+        self.frames += 1
+
+    def log(self):
+        now = time.perf_counter()
+        fps = (self.frames - self._last_frames) / max(now - self._last_time, 1e-9)
+        self._last_frames, self._last_time = self.frames, now
+
+        calibrator = self.tracker.calibrator
+        if calibrator.active or not self.tracker.audio_started:
+            status = calibrator.status_text()
+            if status != self._last_status:
+                logging.info(status)
+                self._last_status = status
+            return
+
+        if self.tracker.mode == "play":
+            elapsed, total = audio_editor.get_progress()
+            index, count, path = audio_editor.current_track()
+            labels = ("volume", "speed")
+            if count > 1:
+                logging.info(f"Track {index + 1}/{count}: {os.path.basename(path)}")
+        else:
+            positions, durations = audio_mixer.get_progress()
+            count = max(len(positions), 1)
+            elapsed, total = sum(positions) / count, sum(durations) / count
+            labels = ("left volume", "right volume")
+        left_value, right_value = self.values
+        logging.info(f"{labels[0]}: {left_value:.2f} | {labels[1]}: {right_value:.2f} | "
+                     f"{elapsed:.0f}/{total:.0f} s | {fps:.1f} fps | {output_policy.status_text()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=("play", "mix"))
+    parser.add_argument("songs", nargs="+", help="audio files (a playlist for play, two for mix)")
+    parser.add_argument("--camera", type=int, default=0, help="camera index")
+    parser.add_argument("--inference-budget-ms", type=float, default=0.0,
+                        help="run inference on an adaptive crop around the hands (ms per frame)")
+    parser.add_argument("--frame-skip", action="store_true", help="predict landmarks between inferences")
+    parser.add_argument("--inference-process", action="store_true",
+                        help="run MediaPipe in a worker process fed through shared memory")
+    parser.add_argument("--profile", help="calibration profile: reused if saved, created by calibrating if not")
+    parser.add_argument("--recalibrate", action="store_true", help="calibrate even if the profile exists")
+    parser.add_argument("--status-interval", type=float, default=5.0, help="seconds between status lines")
+    parser.add_argument("--record-automation", metavar="PATH",
+                        help="record the control stream to this .npz for `automation.py render`")
+    parser.add_argument("--latency-export", help="write per-stage latency to this .json/.csv on exit")
+    args = parser.parse_args(argv)
+
+    if args.mode == "mix" and len(args.songs) != 2:
+        parser.error("mix mode needs exactly two songs")
+    if args.profile:
+        try:
+            check_profile_name(args.profile)
+        except ValueError as e:
+            parser.error(str(e))
+    songs = [os.path.abspath(song) for song in args.songs]
+    for song in songs:
+        if not os.path.isfile(song):
+            parser.error(f"no such file: {song}")
+
+    cap = cv2.VideoCapture(args.camera)
+    if not cap.isOpened():
+        logging.error(f"Camera {args.camera} could not be opened.")
+        return 1
+    frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    tracker = hand_tracking.HandTracker(args.mode, songs, frame_size, capture=cap,
+                                        inference_budget=args.inference_budget_ms / 1000 or None,
+                                        frame_skip=args.frame_skip, mirror=False,
+                                        inference_process=args.inference_process, profile=args.profile)
+    if args.record_automation:
+        from automation import AutomationRecorder
+        tracker.automation = AutomationRecorder(args.record_automation, args.mode, songs)
+    status = KioskStatus(tracker, args.status_interval)
+    pipeline = FramePipeline(tracker, status.on_result)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    logging.info(f"Kiosk started in {args.mode} mode: {', '.join(os.path.basename(s) for s in songs)}")
+    pipeline.start()
+    tracker.begin_calibration(use_profile=not args.recalibrate)
+    code = 0
+    try:
+        while not stop.wait(args.status_interval):
+            if pipeline.frames.closed:
+                logging.error("Camera stopped delivering frames.")
+                code = 1  # a non-zero status lets a supervisor restart the kiosk
+                break
+            status.log()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.latency_export:
+            monitor.export(args.latency_export)
+        pipeline.stop()
+        tracker.cleanup()
+    logging.info("Exited successfully." if code == 0 else "Exited after an error.")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
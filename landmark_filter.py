@@ -0,0 +1,128 @@
+import math
+import time
+import numpy as np
+from landmarks import MAX_HANDS, NUM_LANDMARKS, result_to_arrays, arrays_to_result
+
+
+def _alpha(elapsed, cutoff):
+    r = 2 * math.pi * cutoff * elapsed
+    return r / (r + 1)
+
+
+class OneEuroFilter:
+    """One-Euro low-pass filter over a scalar or an array of values.
+
+    Slow movements get a low cutoff (less jitter); fast movements raise the
+    cutoff by `beta` times the speed (less lag). The filtered derivative is
+    kept in `dx` so callers can extrapolate between measurements.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=5.0, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.x = None
+        self.dx = None
+        self.t = None
+
+    def __call__(self, value, t):
+        value = np.asarray(value, dtype=np.float64)
+        if self.x is None:
+            self.x = value.copy()
+            self.dx = np.zeros_like(self.x)
+            self.t = t
+            return self.x
+        elapsed = t - self.t
+        if elapsed <= 0:
+            return self.x
+        self.t = t
+        self.dx += _alpha(elapsed, self.d_cutoff) * ((value - self.x) / elapsed - self.dx)
+        r = 2 * math.pi * (self.min_cutoff + self.beta * np.abs(self.dx)) * elapsed
+        self.x += r / (r + 1) * (value - self.x)
+        return self.x
+
+    def predict(self, t):
+        """Linear extrapolation of the filtered value to time `t`."""
+        return self.x + self.dx * (t - self.t)
+
+
+class SkippingHandDetector:
+    """Runs the hands model only every Nth frame and predicts landmarks in between.
+
+    Wraps anything with a MediaPipe-style `process(rgb)`. Measured landmarks
+    are smoothed per hand with a OneEuroFilter; on skipped frames the result
+    is the filter's linear prediction. N adapts to hand speed: up to
+    `max_skip` skipped frames while the hands are still, none once they move
+    faster than `fast_speed` (normalized image units per second). A full
+    inference is also forced when the predicted motion since the last one
+    exceeds `max_motion` or the prediction would reach past `max_predict`
+    seconds.
+    """
+
+    def __init__(self, hands, max_skip=3, fast_speed=1.5, max_motion=0.05, max_predict=0.2,
+                 clock=time.perf_counter, min_cutoff=1.0, beta=5.0):
+        self.hands = hands
+        self.max_skip = max_skip
+        self.fast_speed = fast_speed
+        self.max_motion = max_motion
+        self.max_predict = max_predict
+        self.clock = clock
+        self.filters = [OneEuroFilter(min_cutoff, beta) for _ in range(2)]  # by label: Left, Right
+        self.interval = 1
+        self.inferences = 0
+        self.frames = 0
+        self._skipped = 0
+        self._last_inference = None
+        self._labels = np.full(MAX_HANDS, -1, dtype=np.int8)
+        self._points = np.full((MAX_HANDS, NUM_LANDMARKS, 3), np.nan, dtype=np.float32)
+
+    def process(self, rgb):
+        now = self.clock()
+        self.frames += 1
+        if self._should_infer(now):
+            return self._infer(rgb, now)
+        self._skipped += 1
+        for slot, label in enumerate(self._labels):
+            if label >= 0:
+                self._points[slot] = self.filters[label].predict(now)
+        return arrays_to_result(self._points, self._labels)
+
+    def close(self):
+        if hasattr(self.hands, "close"):
+            self.hands.close()
+
+    def _should_infer(self, now):
+        if self._last_inference is None or self._skipped >= self.interval - 1:
+            return True
+        if now - self._last_inference > self.max_predict:
+            return True
+        active = [self.filters[label] for label in self._labels if label >= 0]
+        if not active:
+            return True
+        motion = max(float(np.abs(f.dx[:, :2]).max()) for f in active) * (now - self._last_inference)
+        return motion > self.max_motion
+
+    def _infer(self, rgb, now):
+        result = self.hands.process(rgb)
+        self.inferences += 1
+        self._skipped = 0
+        self._last_inference = now
+        points, labels = result_to_arrays(result)
+        seen = set()
+        speed = 0.0
+        for slot, label in enumerate(labels):
+            if label < 0 or label in seen:
+                continue
+            seen.add(label)
+            points[slot] = self.filters[label](points[slot], now)
+            speed = max(speed, float(np.abs(self.filters[label].dx[:, :2]).max()))
+        for label in range(2):
+            if label not in seen:
+                self.filters[label].reset()
+        self._points, self._labels = points, labels
+        # Still hands may skip up to max_skip frames; fast ones skip none
+        self.interval = 1 + int(round(self.max_skip * max(0.0, 1.0 - speed / self.fast_speed)))
+        return arrays_to_result(points, labels)
@@ -0,0 +1,80 @@
+import numpy as np
+
+NUM_LANDMARKS = 21
+MAX_HANDS = 2
+LABELS = ("Left", "Right")
+
+
+class Landmark:
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x, y, z=0.0):
+        self.x, self.y, self.z = x, y, z
+
+
+class HandLandmarks:
+    __slots__ = ("landmark",)
+
+    def __init__(self, landmark):
+        self.landmark = landmark
+
+
+class Classification:
+    __slots__ = ("label", "score")
+
+    def __init__(self, label, score=1.0):
+        self.label, self.score = label, score
+
+
+class Handedness:
+    __slots__ = ("classification",)
+
+    def __init__(self, classification):
+        self.classification = classification
+
+
+class HandsResult:
+    """Same shape as the object returned by mp.solutions.hands.Hands.process."""
+
+    def __init__(self, multi_hand_landmarks=None, multi_handedness=None):
+        self.multi_hand_landmarks = multi_hand_landmarks
+        self.multi_handedness = multi_handedness
+
+
+def result_to_arrays(result, points=None, labels=None):
+    """Pack a hands result into (MAX_HANDS, 21, 3) float32 points and int8 labels.
+
+    Labels are 0 for "Left", 1 for "Right" and -1 for an empty slot (whose
+    points are NaN). Pass `points`/`labels` to reuse existing arrays.
+    """
+    if points is None:
+        points = np.empty((MAX_HANDS, NUM_LANDMARKS, 3), dtype=np.float32)
+    if labels is None:
+        labels = np.empty(MAX_HANDS, dtype=np.int8)
+    points.fill(np.nan)
+    labels.fill(-1)
+    if result.multi_hand_landmarks:
+        pairs = zip(result.multi_hand_landmarks, result.multi_handedness)
+        for slot, (hand_landmarks, handedness) in zip(range(MAX_HANDS), pairs):
+            points[slot] = [(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark]
+            labels[slot] = LABELS.index(handedness.classification[0].label)
+    return points, labels
+
+
+def arrays_to_result(points, labels):
+    """Inverse of result_to_arrays; returns a HandsResult with plain Python objects."""
+    hands, handedness = [], []
+    for slot in range(len(labels)):
+        if labels[slot] < 0:
+            continue
+        hands.append(HandLandmarks([Landmark(float(x), float(y), float(z)) for x, y, z in points[slot]]))
+        handedness.append(Handedness([Classification(LABELS[labels[slot]])]))
+    if not hands:
+        return HandsResult()
+    return HandsResult(hands, handedness)
+
+
+def create_hands():
+    """Build the MediaPipe hands model; mediapipe (~1 s to import) is loaded here, not at import."""
+    import mediapipe as mp
+    return mp.solutions.hands.Hands(min_detection_confidence=0.5, min_tracking_confidence=0.5)
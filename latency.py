@@ -0,0 +1,98 @@
+import os
+import csv
+import json
+import time
+import numpy as np
+
+# Stages of the motion-to-sound path, in pipeline order
+STAGES = (
+    "capture",          # cap.read()
+    "preprocess",       # BGR->RGB + flip into a reused buffer
+    "inference",        # hands.process
+    "gesture",          # landmark maths, gestures, publishing audio targets
+    "draw",             # fingertip overlay
+    "render",           # resize to display size + overlay + QPixmap on the GUI thread
+    "audio_callback",   # time spent inside the audio callback
+    "param_pickup",     # camera frame captured -> new target seen by the audio callback
+    "motion_to_sound",  # param_pickup + audio block and device output latency
+)
+
+
+class StageStats:
+    """Rolling window of durations for one stage."""
+
+    def __init__(self, window):
+        self.samples = np.zeros(window, dtype=np.float64)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples[self.count % len(self.samples)] = seconds
+        self.count += 1
+
+    def summary(self):
+        n = min(self.count, len(self.samples))
+        if not n:
+            return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+        window = self.samples[:n] * 1000.0
+        p50, p95, p99 = np.percentile(window, (50, 95, 99))
+        return {"count": self.count, "mean_ms": float(window.mean()),
+                "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+class LatencyMonitor:
+    """Per-stage timing for the capture -> inference -> gesture -> audio path.
+
+    Timestamps come from time.perf_counter (monotonic). Each stage keeps the
+    last `window` durations so percentiles reflect recent behaviour.
+    Recording is a single array store, cheap enough for the audio callback.
+    """
+
+    def __init__(self, window=1024, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.stats = {stage: StageStats(window) for stage in STAGES}
+
+    now = staticmethod(time.perf_counter)
+
+    def record(self, stage, seconds):
+        if self.enabled:
+            self.stats[stage].add(seconds)
+
+    def since(self, stage, start):
+        """Record the time elapsed since `start`; returns the current timestamp."""
+        end = time.perf_counter()
+        if self.enabled:
+            self.stats[stage].add(end - start)
+        return end
+
+    def reset(self, stages=STAGES):
+        for stage in stages:
+            self.stats[stage] = StageStats(self.window)
+
+    def summary(self):
+        return {stage: stats.summary() for stage, stats in self.stats.items()}
+
+    def overlay_text(self):
+        lines = [f"{'stage':<16}{'p50':>7}{'p95':>7}{'p99':>7} ms"]
+        for stage, s in self.summary().items():
+            if s["count"]:
+                lines.append(f"{stage:<16}{s['p50_ms']:>7.1f}{s['p95_ms']:>7.1f}{s['p99_ms']:>7.1f}")
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Write the summary as JSON or CSV (chosen by file extension)."""
+        summary = self.summary()
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["stage", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"])
+                for stage, s in summary.items():
+                    writer.writerow([stage, s["count"], f"{s['mean_ms']:.4f}", f"{s['p50_ms']:.4f}",
+                                     f"{s['p95_ms']:.4f}", f"{s['p99_ms']:.4f}"])
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"created": time.time(), "stages": summary}, f, indent=2)
+
+
+# Global instance
+monitor = LatencyMonitor(enabled=os.environ.get("MUSIC_CONTROL_LATENCY", "1") != "0")
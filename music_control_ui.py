@@ -1,17 +1,28 @@
 import sys
 import os
-import pyautogui
-import cv2
+import logging
+from startup import timer as startup_timer, Prewarmer, TAKE_TIMEOUT
 import numpy as np
 from PyQt5 import QtWidgets, QtGui, QtCore
 import hand_tracking
 import audio_editor
 import audio_mixer
+from frame_pipeline import FramePipeline, LatestSlot
+from latency import monitor
+from audio_backend import output_policy
+from waveform import waveforms
+from calibration import check_profile_name
+
+startup_timer.mark("imports")
 
 class MusicControlApp(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
+        # Camera and hands model warm up while the user picks a mode and songs
+        self.prewarmer = Prewarmer(timer=startup_timer, inference_process=inference_process())
+        self.prewarmer.start()
         self.init_ui()
+        startup_timer.mark("mode_screen")
 
     def init_ui(self):
         self.setWindowTitle("Gesture Music Control")
@@ -56,7 +67,7 @@ class MusicControlApp(QtWidgets.QWidget):
         self.label.setAlignment(QtCore.Qt.AlignCenter)
 
         self.mix_button = QtWidgets.QPushButton("🎵 Mix Two Songs")
-        self.play_button = QtWidgets.QPushButton("🎶 Play One Song")
+        self.play_button = QtWidgets.QPushButton("🎶 Play Songs")
 
         button_style = """
             QPushButton {
@@ -99,26 +110,179 @@ class MusicControlApp(QtWidgets.QWidget):
             if mode == "mix" and len(songs) != 2:
                 QtWidgets.QMessageBox.warning(self, "Error", "Please select exactly two songs for mixing.")
                 return
-            if mode == "play" and len(songs) != 1:
-                QtWidgets.QMessageBox.warning(self, "Error", "Please select exactly one song for playback.")
+            if mode == "play" and not songs:
+                QtWidgets.QMessageBox.warning(self, "Error", "Please select at least one song for playback.")
                 return
+            startup_timer.mark("songs_selected")
             self.hide()
-            self.window = HandTrackingWindow(mode, songs)
+            self.window = HandTrackingWindow(mode, songs, self.prewarmer)
             self.window.show()
 
 
+def screen_size():
+    size = QtWidgets.QApplication.primaryScreen().size()
+    return size.width(), size.height()
+
+
+def inference_process():
+    return os.environ.get("MUSIC_CONTROL_INFERENCE_PROCESS") == "1"
+
+
+def calibration_profile():
+    """MUSIC_CONTROL_PROFILE if it is a valid profile name; otherwise calibrate without one."""
+    name = os.environ.get("MUSIC_CONTROL_PROFILE")
+    if not name:
+        return None
+    try:
+        return check_profile_name(name)
+    except ValueError as e:
+        logging.warning(f"Ignoring MUSIC_CONTROL_PROFILE: {e}")
+        return None
+
+
+class VideoView:
+    """Paints tracker frames into a QLabel at display size.
+
+    The frame is resized once into a preallocated display-size buffer that a
+    QImage wraps without copying; the buffer and target size are only
+    rebuilt when the label or camera resolution changes. Fingertips are
+    drawn with QPainter on the small image rather than on the camera frame.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self._key = None
+        self._buffer = None
+        self._image = None
+        self._pen = QtGui.QPen(QtGui.QColor(255, 255, 255), 2)
+
+    def _prepare(self, frame_shape):
+        label_size = self.label.size()
+        key = (frame_shape, label_size.width(), label_size.height())
+        if key == self._key:
+            return
+        h, w = frame_shape[:2]
+        scale = min(label_size.width() / w, label_size.height() / h)
+        tw, th = max(int(w * scale), 1), max(int(h * scale), 1)
+        self._buffer = np.empty((th, tw, 3), dtype=np.uint8)
+        self._image = QtGui.QImage(self._buffer.data, tw, th, self._buffer.strides[0], QtGui.QImage.Format_RGB888)
+        self._key = key
+
+    def paint(self, rgb, overlay):
+        import cv2  # already loaded by the prewarm thread; not imported up front so the window opens sooner
+        self._prepare(rgb.shape)
+        th, tw = self._buffer.shape[:2]
+        cv2.resize(rgb, (tw, th), dst=self._buffer, interpolation=cv2.INTER_LINEAR)
+
+        if overlay:
+            painter = QtGui.QPainter(self._image)
+            painter.setRenderHint(QtGui.QPainter.Antialiasing)
+            painter.setPen(self._pen)
+            radius = max(6, int(16 * tw / rgb.shape[1]))
+            for (ix, iy), (tx, ty) in overlay:
+                index_pos = QtCore.QPointF(ix * tw, iy * th)
+                thumb_pos = QtCore.QPointF(tx * tw, ty * th)
+                painter.drawEllipse(index_pos, radius, radius)
+                painter.drawEllipse(thumb_pos, radius, radius)
+                painter.drawLine(index_pos, thumb_pos)
+            painter.end()
+
+        self.label.setPixmap(QtGui.QPixmap.fromImage(self._image))
+
+
+class WaveformView(QtWidgets.QWidget):
+    """Scrolling waveform around the playhead, drawn from a WaveformIndex.
+
+    The image is filled column-wise with NumPy into a buffer that is only
+    reallocated on resize, then blitted; no per-column Python drawing.
+    """
+
+    def __init__(self, span=12.0, parent=None):
+        super().__init__(parent)
+        self.span = span  # seconds visible
+        self.index = None
+        self.position = 0.0
+        self.setMinimumHeight(60)
+        self._buffer = None
+        self._image = None
+        self._rows = None
+
+    def show_position(self, index, seconds):
+        self.index = index
+        self.position = seconds
+        self.update()
+
+    def _prepare(self, w, h):
+        if self._buffer is not None and self._buffer.shape[:2] == (h, w):
+            return
+        self._buffer = np.empty((h, w, 3), dtype=np.uint8)
+        self._image = QtGui.QImage(self._buffer.data, w, h, self._buffer.strides[0], QtGui.QImage.Format_RGB888)
+        mid = (h - 1) / 2
+        self._rows = np.abs(np.arange(h) - mid)[:, None] / max(mid, 1)
+
+    def paintEvent(self, event):
+        w, h = self.width(), self.height()
+        if w <= 0 or h <= 0:
+            return
+        self._prepare(w, h)
+        img = self._buffer
+        img[:] = (0x23, 0x27, 0x2A)
+        if self.index is not None:
+            half = self.span / 2
+            peak, rms = self.index.window(self.position - half, self.position + half, w)
+            img[self._rows <= peak] = (0x5B, 0x6E, 0xAE)
+            img[self._rows <= rms] = (0x72, 0x89, 0xDA)
+        img[:, w // 2] = (255, 255, 255)  # playhead
+        painter = QtGui.QPainter(self)
+        painter.drawImage(0, 0, self._image)
+        painter.end()
+
+
+class FrameBridge(QtCore.QObject):
+    """Hands tracking results from the inference thread to the GUI thread."""
+    frame_ready = QtCore.pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.results = LatestSlot()
+
+    def publish(self, result):
+        # Only one signal is ever in flight; later results overwrite the slot
+        # so a busy GUI thread paints the newest frame and skips the rest.
+        if self.results.put(result):
+            self.frame_ready.emit()
+
+
 class HandTrackingWindow(QtWidgets.QWidget):
-    def __init__(self, mode, songs):
+    def __init__(self, mode, songs, prewarmer=None):
         super().__init__()
         self.mode = mode
         self.songs = songs
-        self.tracker = hand_tracking.HandTracker(mode, songs, pyautogui.size())
+        self.first_frame_shown = False
+        self.shown_track = None
+        capture, hands = prewarmer.take(TAKE_TIMEOUT) if prewarmer else (None, None)
+        if prewarmer and capture is None:
+            logging.warning("No warmed-up camera; opening it directly.")
+        budget_ms = float(os.environ.get("MUSIC_CONTROL_INFERENCE_BUDGET_MS", "0"))
+        self.tracker = hand_tracking.HandTracker(mode, songs, screen_size(), capture=capture, hands=hands,
+                                                 inference_budget=budget_ms / 1000 or None,
+                                                 frame_skip=os.environ.get("MUSIC_CONTROL_FRAME_SKIP") == "1",
+                                                 inference_process=inference_process(),
+                                                 profile=calibration_profile())
+        automation_path = os.environ.get("MUSIC_CONTROL_AUTOMATION")
+        if automation_path:
+            from automation import AutomationRecorder
+            self.tracker.automation = AutomationRecorder(automation_path, mode, songs)
+        self.bridge = FrameBridge()
+        self.bridge.frame_ready.connect(self.update_frame, QtCore.Qt.QueuedConnection)
+        self.pipeline = FramePipeline(self.tracker, self.bridge.publish)
         self.init_ui()
         self.start_tracking()
+        startup_timer.mark("tracking_window")
 
     def init_ui(self):
         self.setWindowTitle("Gesture Music Controller")
-        screen_width, screen_height = pyautogui.size()
+        screen_width, screen_height = screen_size()
         # self.setGeometry(0, 0, screen_width, screen_height)
         self.showFullScreen()
 
@@ -144,6 +308,8 @@ class HandTrackingWindow(QtWidgets.QWidget):
         self.video_label = QtWidgets.QLabel()
         self.video_label.setFixedSize(int(screen_width * 0.6), int(screen_height * 0.8))
         self.video_label.setStyleSheet("background-color: black;")
+        self.video_label.setAlignment(QtCore.Qt.AlignCenter)
+        self.video_view = VideoView(self.video_label)
 
         self.left_bar = QtWidgets.QProgressBar()
         self.left_bar.setOrientation(QtCore.Qt.Vertical)
@@ -157,12 +323,22 @@ class HandTrackingWindow(QtWidgets.QWidget):
 
         self.progress_bar = QtWidgets.QProgressBar()
         self.progress_bar.setTextVisible(True)
-        self.progress_bar.setFormat("%v / %m sec")
         self.progress_bar.setStyleSheet("QProgressBar::chunk { background-color: #7289DA; } QProgressBar { background-color: #555; color: white; }")
 
+        # One scrolling waveform per deck (the current track in play mode)
+        self.waveform_views = [WaveformView() for _ in (self.songs if self.mode == "mix" else self.songs[:1])]
+        for song in self.songs:
+            waveforms.get(song)  # start building in the background
+
         self.status_label = QtWidgets.QLabel("🖐️ Waiting for hands...")
         self.status_label.setAlignment(QtCore.Qt.AlignCenter)
 
+        # Latency overlay on top of the video; toggle with "L"
+        self.latency_label = QtWidgets.QLabel(self.video_label)
+        self.latency_label.setStyleSheet("font-family: monospace; font-size: 12px; color: #00FF88; "
+                                         "background-color: rgba(0, 0, 0, 160); padding: 4px;")
+        self.latency_label.setVisible(os.environ.get("MUSIC_CONTROL_LATENCY_OVERLAY") == "1")
+
         self.exit_button = QtWidgets.QPushButton("❌ Exit")
         self.exit_button.setStyleSheet("font-size: 14px; padding: 6px; background-color: red; color: white; border-radius: 8px;")
         self.exit_button.clicked.connect(self.exit_app)
@@ -182,6 +358,8 @@ class HandTrackingWindow(QtWidgets.QWidget):
 
         bottom_layout = QtWidgets.QVBoxLayout()
         bottom_layout.addWidget(self.status_label)
+        for view in self.waveform_views:
+            bottom_layout.addWidget(view)
         bottom_layout.addWidget(self.progress_bar)
         bottom_layout.addWidget(self.exit_button)
 
@@ -193,47 +371,85 @@ class HandTrackingWindow(QtWidgets.QWidget):
         self.setLayout(layout)
 
     def start_tracking(self):
-        QtCore.QTimer.singleShot(500, self.run_calibration)
-        self.timer = QtCore.QTimer()
-        self.timer.timeout.connect(self.update_frame)
-        self.timer.start(33)
+        # Capture and inference run on worker threads; the GUI thread only
+        # paints what FrameBridge delivers.
+        self.pipeline.start()
+        # A saved profile needs no calibration, so audio starts right away
+        QtCore.QTimer.singleShot(0 if self.tracker.profile_name else 500, self.run_calibration)
 
     def run_calibration(self):
-        self.status_label.setText("🖐️ Calibrating... please pinch and extend")
-        self.tracker.calibrate_distances()
-        self.tracker.start_audio()
-        self.status_label.setText("✅ Calibration complete. Gesture control active!")
+        # Calibration advances inside process_frame on the inference thread and
+        # starts audio once done, so the video keeps running meanwhile.
+        self.tracker.begin_calibration()
+        if self.tracker.profile is not None:
+            self.status_label.setText(f"✅ Profile '{self.tracker.profile.name}' loaded. Gesture control active!")
 
     def update_frame(self):
-        ret, frame = self.tracker.cap.read()
-        if not ret:
+        result = self.bridge.results.get(timeout=0)
+        if result is None:
             return
 
-        frame, left_volume, right_value = self.tracker.process_frame(frame)
+        frame, left_volume, right_value, overlay = result
+
+        if self.tracker.calibrator.phase is not None:
+            self.status_label.setText(self.tracker.calibrator.status_text())
 
         self.left_bar.setValue(int(left_volume * 100))
         self.right_bar.setValue(int(right_value * 100))
 
         if self.mode == "play":
             elapsed, total = audio_editor.get_progress()
+            index, count, path = audio_editor.current_track()
+            if count > 1 and index != self.shown_track:
+                self.shown_track = index
+                self.song_label.setText(f"Song {index + 1}/{count}: {os.path.basename(path)}")
+            self.waveform_views[0].show_position(waveforms.get(path), elapsed)
         else:
-            (pos1, pos2), (dur1, dur2) = audio_mixer.get_progress()
-            elapsed, total = (pos1 + pos2) / 2, (dur1 + dur2) / 2
-
-        self.progress_bar.setMaximum(int(total))
-        self.progress_bar.setValue(int(elapsed))
-
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = QtGui.QImage(rgb.data, rgb.shape[1], rgb.shape[0], rgb.strides[0], QtGui.QImage.Format_RGB888)
-        pixmap = QtGui.QPixmap.fromImage(img).scaled(self.video_label.size(), QtCore.Qt.KeepAspectRatio)
-        self.video_label.setPixmap(pixmap)
+            positions, durations = audio_mixer.get_progress()
+            count = max(len(positions), 1)
+            elapsed, total = sum(positions) / count, sum(durations) / count
+            for view, song, position in zip(self.waveform_views, self.songs, positions):
+                view.show_position(waveforms.get(song), position)
+
+        # Millisecond resolution; the text shows tenths of a second
+        self.progress_bar.setMaximum(max(int(total * 1000), 1))
+        self.progress_bar.setValue(int(elapsed * 1000))
+        self.progress_bar.setFormat(f"{elapsed:.1f} / {total:.1f} sec")
+
+        started = monitor.now()
+        self.video_view.paint(frame, overlay)
+        monitor.since("render", started)
+
+        if not self.first_frame_shown:
+            self.first_frame_shown = True
+            startup_timer.mark("first_frame")
+            logging.info("Startup timings:\n" + startup_timer.report())
+
+        if self.latency_label.isVisible():
+            self.latency_label.setText(monitor.overlay_text() + "\n" + output_policy.status_text())
+            self.latency_label.adjustSize()
+
+    def keyPressEvent(self, event):
+        if event.key() == QtCore.Qt.Key_L:
+            self.latency_label.setVisible(not self.latency_label.isVisible())
+        elif event.key() == QtCore.Qt.Key_C:
+            self.tracker.begin_calibration(use_profile=False)
+        elif event.key() == QtCore.Qt.Key_T and self.mode == "play":
+            audio_editor.set_time_stretch(not audio_editor.get_editor().time_stretch)
+        else:
+            super().keyPressEvent(event)
 
     def exit_app(self):
+        export_path = os.environ.get("MUSIC_CONTROL_LATENCY_EXPORT")
+        if export_path:
+            monitor.export(export_path)
+        self.pipeline.stop()
         self.tracker.cleanup_and_exit()
         QtWidgets.QApplication.quit()
 
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
     window = MusicControlApp()
+    app.aboutToQuit.connect(window.prewarmer.close)
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
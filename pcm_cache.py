@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import logging
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "MUSIC_CONTROL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "music-control"))
+DEFAULT_MAX_MB = int(os.environ.get("MUSIC_CONTROL_CACHE_MB", "2048"))
+
+
+class PCMCache:
+    """On-disk cache of decoded mono PCM as memory-mappable .npy files.
+
+    Entries are keyed by absolute path, file size and mtime, so an edited or
+    replaced file is decoded again. Each entry is a float32 `<key>.npy` plus a
+    `<key>.json` with the samplerate and frame count. Reading an entry touches
+    its mtime, and the least recently used entries are evicted once the cache
+    grows past `max_bytes`.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = os.path.join(root or DEFAULT_CACHE_DIR, "pcm")
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_MB * 1024 * 1024
+
+    def key(self, path):
+        st = os.stat(path)
+        ident = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+        return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.root, key)
+        return base + ".npy", base + ".json"
+
+    def info(self, path):
+        """Cached metadata for `path`, or None if it has not been decoded yet."""
+        try:
+            _, meta_path = self._paths(self.key(path))
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def lookup(self, path):
+        """Return (samples, metadata) with samples memory-mapped read-only, or None."""
+        try:
+            key = self.key(path)
+        except OSError:
+            return None
+        data_path, _ = self._paths(key)
+        meta = self.info(path)
+        if meta is None or not os.path.exists(data_path):
+            return None
+        try:
+            data = np.load(data_path, mmap_mode="r")
+            os.utime(data_path)  # mark as recently used
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding unreadable cache entry for {path}: {e}")
+            self._remove(key)
+            return None
+        return data[:meta["frames"]], meta
+
+    def writer(self, path, frames, samplerate):
+        """Start a new entry for `path`; returns None if the cache cannot be written."""
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            return CacheWriter(self, self.key(path), path, frames, samplerate)
+        except OSError as e:
+            logging.warning(f"PCM cache disabled for {path}: {e}")
+            return None
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".npy"):
+                st = os.stat(os.path.join(self.root, name))
+                entries.append((st.st_mtime, st.st_size, name[:-4]))
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+
+    def _remove(self, key):
+        for p in self._paths(key):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+
+class CacheWriter:
+    """Fills a cache entry sequentially while a track is being decoded.
+
+    Data goes to a temporary memory-mapped file, unique to this writer, that
+    is only renamed into place once the whole track has been written, so
+    readers never see a partial entry and two writers for the same track
+    never share one.
+    """
+
+    def __init__(self, cache, key, path, frames, samplerate):
+        self.cache = cache
+        self.key = key
+        self.path = path
+        self.frames = frames
+        self.samplerate = samplerate
+        self.written = 0
+        self.data_path, self.meta_path = cache._paths(key)
+        fd, self.tmp_path = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=cache.root)
+        os.close(fd)
+        try:
+            self._data = np.lib.format.open_memmap(self.tmp_path, mode="w+", dtype=np.float32, shape=(max(frames, 1),))
+        except OSError:
+            os.remove(self.tmp_path)
+            raise
+
+    @property
+    def data(self):
+        """The entry being filled (valid up to `written`); None once committed or aborted."""
+        return self._data
+
+    def write(self, offset, samples):
+        """Append decoded samples that start at frame `offset`; out-of-order data is ignored."""
+        if self._data is None or offset != self.written:
+            return
+        n = min(len(samples), self.frames - self.written)
+        self._data[self.written:self.written + n] = samples[:n]
+        self.written += n
+
+    def commit(self):
+        if self._data is None:
+            return
+        self._data.flush()
+        self._data = None
+        try:
+            os.replace(self.tmp_path, self.data_path)
+            meta = {"path": os.path.abspath(self.path), "samplerate": self.samplerate,
+                    "frames": self.written, "created": time.time()}
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        except OSError as e:
+            logging.warning(f"Could not store cache entry for {self.path}: {e}")
+            self.abort()
+            return
+        self.cache.evict()
+
+    def abort(self):
+        self._data = None
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+# Global instance
+cache = PCMCache()
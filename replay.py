@@ -0,0 +1,288 @@
+"""Record hand-tracking sessions and replay them without a camera or sound card.
+
+    python replay.py record session.npz --seconds 30 --frames
+    python replay.py play session.npz --mode play Songs/track.mp3
+
+A session is an .npz file with per-frame timestamps, landmark arrays
+(see landmarks.result_to_arrays) and the camera frame size. With --frames
+the raw camera frames are also written to a matching .avi file.
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import numpy as np
+import cv2
+from landmarks import NUM_LANDMARKS, MAX_HANDS, result_to_arrays, arrays_to_result
+
+
+def video_path(path):
+    return os.path.splitext(path)[0] + ".avi"
+
+
+class SessionRecorder:
+    """Collects landmark arrays (and optionally frames) from HandTracker.process_frame."""
+
+    def __init__(self, path, save_frames=False, fps=30):
+        self.path = path
+        self.save_frames = save_frames
+        self.fps = fps
+        self.timestamps = []
+        self.points = []
+        self.labels = []
+        self.frame_size = (0, 0)
+        self._writer = None
+
+    def add(self, timestamp, result, frame=None):
+        points, labels = result_to_arrays(result)
+        self.timestamps.append(timestamp)
+        self.points.append(points)
+        self.labels.append(labels)
+        if frame is not None:
+            h, w = frame.shape[:2]
+            self.frame_size = (w, h)
+            if self.save_frames:
+                if self._writer is None:
+                    self._writer = cv2.VideoWriter(video_path(self.path), cv2.VideoWriter_fourcc(*"MJPG"),
+                                                   self.fps, (w, h))
+                self._writer.write(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+        timestamps = np.asarray(self.timestamps, dtype=np.float64)
+        np.savez_compressed(
+            self.path,
+            timestamps=timestamps - (timestamps[0] if len(timestamps) else 0.0),
+            points=np.asarray(self.points, dtype=np.float32).reshape(-1, MAX_HANDS, NUM_LANDMARKS, 3),
+            labels=np.asarray(self.labels, dtype=np.int8).reshape(-1, MAX_HANDS),
+            frame_size=np.asarray(self.frame_size, dtype=np.int32))
+        logging.info(f"Recorded {len(timestamps)} frames to {self.path}")
+
+
+def load_session(path):
+    with np.load(path) as f:
+        session = {name: f[name] for name in f.files}
+    session["video"] = video_path(path) if os.path.exists(video_path(path)) else None
+    return session
+
+
+def synthetic_session(seconds=20.0, fps=30, seed=0):
+    """Two hands that show up, pinch, extend, then wander and tap now and then.
+
+    The first seconds follow the calibration script (hands visible, pinch for
+    3 s, extend for 3 s) so a replayed tracker calibrates itself.
+    """
+    rng = np.random.default_rng(seed)
+    count = int(seconds * fps)
+    timestamps = np.arange(count) / fps
+    # Wrist at the origin, five fingers fanned upwards, four joints each
+    angles = np.radians([-60, -25, -5, 15, 35])
+    radii = np.array([0.04, 0.08, 0.11, 0.13])
+    template = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+    for finger, angle in enumerate(angles):
+        for joint, radius in enumerate(radii):
+            template[1 + finger * 4 + joint, :2] = (radius * np.sin(angle), -radius * np.cos(angle))
+
+    points = np.empty((count, MAX_HANDS, NUM_LANDMARKS, 3), dtype=np.float32)
+    labels = np.tile(np.array([0, 1], dtype=np.int8), (count, 1))
+    for i, t in enumerate(timestamps):
+        if t < 1.0 or 4.0 <= t < 7.0:
+            opening = 1.0
+        elif t < 4.0:
+            opening = 0.0
+        else:
+            opening = 0.5 + 0.5 * np.sin(t * np.array([1.3, 0.7]))
+        for hand, centre in enumerate(((0.3, 0.75), (0.7, 0.75))):
+            pts = template.copy()
+            if hand == 0:
+                pts[:, 0] *= -1
+            # Close the index (8) and thumb (4) tips toward their midpoint
+            o = opening if np.isscalar(opening) else opening[hand]
+            mid = (pts[4] + pts[8]) / 2
+            pts[4] = mid + (pts[4] - mid) * (0.1 + 0.9 * o)
+            pts[8] = mid + (pts[8] - mid) * (0.1 + 0.9 * o)
+            pts[:, :2] += centre + rng.normal(0, 0.002, 2)
+            points[i, hand] = pts
+        if t > 8.0 and int(t) % 6 == 0 and t % 1.0 < 0.2:
+            points[i, 1, 12] = points[i, 0, 12] + 0.01  # middle fingertips touch: tap
+    return {"timestamps": timestamps, "points": points, "labels": labels,
+            "frame_size": np.array([640, 480], dtype=np.int32), "video": None}
+
+
+class ReplayHands:
+    """Drop-in for mp Hands that returns the recorded landmarks frame by frame."""
+
+    def __init__(self, session, loop=True):
+        self.points = session["points"]
+        self.labels = session["labels"]
+        self.loop = loop
+        self.index = 0
+
+    def process(self, rgb):
+        if self.index >= len(self.labels):
+            if not self.loop:
+                return arrays_to_result(self.points[0], np.full(MAX_HANDS, -1, dtype=np.int8))
+            self.index = 0
+        result = arrays_to_result(self.points[self.index], self.labels[self.index])
+        self.index += 1
+        return result
+
+    def close(self):
+        pass
+
+
+class ReplayCapture:
+    """Drop-in for cv2.VideoCapture over a recorded session.
+
+    Uses the recorded video when there is one, otherwise blank frames of the
+    recorded size. With realtime=True, read() is paced by the timestamps.
+    """
+
+    def __init__(self, session, realtime=False):
+        self.timestamps = session["timestamps"]
+        self.realtime = realtime
+        self.index = 0
+        self._video = cv2.VideoCapture(session["video"]) if session.get("video") else None
+        w, h = (int(v) for v in session["frame_size"])
+        self._blank = np.zeros((h or 480, w or 640, 3), dtype=np.uint8)
+        self._start = None
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if self.index >= len(self.timestamps):
+            return False, None
+        if self.realtime:
+            if self._start is None:
+                self._start = time.perf_counter()
+            delay = self._start + self.timestamps[self.index] - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.index += 1
+        if self._video is not None:
+            ret, frame = self._video.read()
+            if ret:
+                return True, frame
+        return True, self._blank
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self._blank.shape[1]
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self._blank.shape[0]
+        if prop == cv2.CAP_PROP_FPS and len(self.timestamps) > 1:
+            return (len(self.timestamps) - 1) / max(self.timestamps[-1], 1e-9)
+        return 0.0
+
+    def release(self):
+        if self._video is not None:
+            self._video.release()
+
+
+def make_replay_tracker(session, mode, songs, realtime=False, use_mediapipe=False, **tracker_options):
+    """A HandTracker fed from `session`, with audio routed to the null sink."""
+    import audio_backend
+    import hand_tracking
+    audio_backend.use_null_sink(realtime=realtime)
+    hands = None if use_mediapipe else ReplayHands(session)
+    return hand_tracking.HandTracker(mode, songs, (0, 0), capture=ReplayCapture(session, realtime), hands=hands,
+                                     **tracker_options)
+
+
+def run_replay(tracker, session):
+    """Feed every recorded frame through process_frame, timestamped by the session clock.
+
+    Returns the number of frames processed and the wall-clock time taken.
+    """
+    timestamps = session["timestamps"]
+    base = time.perf_counter()
+    tracker.begin_calibration()
+    count = 0
+    started = time.perf_counter()
+    while True:
+        ret, frame = tracker.cap.read()
+        if not ret:
+            break
+        tracker.process_frame(frame, base + timestamps[count])
+        count += 1
+    elapsed = time.perf_counter() - started
+    if not tracker.cap.realtime:
+        # The session clock ran ahead of the audio clock, so these are meaningless.
+        # Stop the sink first: it would keep picking up the last targets after the reset.
+        import audio_editor
+        import audio_mixer
+        from latency import monitor
+        player = audio_mixer.get_mixer() if tracker.mode == "mix" else audio_editor.get_editor()
+        if player.stream:
+            player.stream.stop()
+        monitor.reset(("param_pickup", "motion_to_sound"))
+    return count, elapsed
+
+
+def record(args):
+    from landmarks import create_hands
+    cap = cv2.VideoCapture(0)
+    hands = create_hands()
+    recorder = SessionRecorder(args.session, save_frames=args.frames)
+    end = time.perf_counter() + args.seconds
+    while time.perf_counter() < end:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        captured_at = time.perf_counter()
+        rgb = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
+        recorder.add(captured_at, hands.process(rgb), frame)
+    cap.release()
+    recorder.close()
+
+
+def play(args):
+    from latency import monitor
+    session = synthetic_session() if args.session == "synthetic" else load_session(args.session)
+    tracker = make_replay_tracker(session, args.mode, args.songs, realtime=args.realtime,
+                                  use_mediapipe=args.mediapipe, frame_skip=args.frame_skip, profile=args.profile)
+    if args.automation:
+        from automation import AutomationRecorder
+        tracker.automation = AutomationRecorder(args.automation, args.mode, [os.path.abspath(s) for s in args.songs])
+    count, elapsed = run_replay(tracker, session)
+    print(f"Replayed {count} frames in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.1f} FPS)")
+    print(monitor.overlay_text())
+    tracker.cleanup_and_exit()
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Record or replay hand-tracking sessions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="record landmarks (and frames) from the webcam")
+    rec.add_argument("session")
+    rec.add_argument("--seconds", type=float, default=30.0)
+    rec.add_argument("--frames", action="store_true", help="also save camera frames")
+    rep = sub.add_parser("play", help="replay a session through HandTracker with a null audio sink")
+    rep.add_argument("session", help="session .npz, or 'synthetic'")
+    rep.add_argument("songs", nargs="+")
+    rep.add_argument("--mode", choices=("play", "mix"), default="play")
+    rep.add_argument("--realtime", action="store_true", help="pace frames and audio in real time")
+    rep.add_argument("--mediapipe", action="store_true", help="run MediaPipe on the recorded frames")
+    rep.add_argument("--frame-skip", action="store_true", help="predict landmarks between inferences")
+    rep.add_argument("--automation", help="record the control stream to this .npz (see automation.py)")
+    rep.add_argument("--profile", help="use (or calibrate and save) this calibration profile")
+    args = parser.parse_args(argv)
+    if getattr(args, "profile", None):
+        from calibration import check_profile_name
+        try:
+            check_profile_name(args.profile)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.command == "record":
+        record(args)
+    else:
+        play(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import numpy as np
+
+
+class LinearResampler:
+    """Variable-rate linear-interpolating reader over a streaming source.
+
+    The read position is kept as a fraction between blocks, so the playback
+    speed is exact over time instead of being truncated once per callback.
+    All work arrays are allocated up front for blocks of up to `max_frames`
+    output frames at rates up to `max_ratio`; `process` writes the result
+    straight into the caller's output buffer.
+
+    `valid` is how many frames of the last call came from the source; once
+    it has run dry the rest of the block is silence.
+    """
+
+    def __init__(self, max_frames=8192, max_ratio=2.0):
+        self.max_frames = max_frames
+        self.max_ratio = max_ratio
+        self.position = 0.0  # input frames consumed, including the fraction
+        self._frac = 0.0
+        self._avail = 0  # valid input samples at the start of self._in
+        self._real = None  # once the source has run dry: how many of those are real samples
+        self.valid = 0
+        self._ramp = np.arange(max_frames, dtype=np.float64)
+        self._pos = np.zeros(max_frames, dtype=np.float64)
+        self._floor = np.zeros(max_frames, dtype=np.float64)
+        self._idx = np.zeros(max_frames, dtype=np.intp)
+        self._idx1 = np.zeros(max_frames, dtype=np.intp)
+        self._a = np.zeros(max_frames, dtype=np.float32)
+        self._b = np.zeros(max_frames, dtype=np.float32)
+        self._w = np.zeros(max_frames, dtype=np.float32)
+        self._in = np.zeros(int(max_frames * max_ratio) + 4, dtype=np.float32)
+
+    def reset(self, position=0.0):
+        self.position = float(position)
+        self._frac = 0.0
+        self._avail = 0
+        self._real = None
+
+    def process(self, out, ratio, source):
+        """Render len(out) frames read from `source` at `ratio` input frames per output frame.
+
+        Returns False once the source has run dry; the missing tail is silence.
+        """
+        frames = len(out)
+        if frames > self.max_frames:
+            # Larger blocks than planned for are split rather than reallocated
+            alive = True
+            valid = None
+            for start in range(0, frames, self.max_frames):
+                chunk = out[start:start + self.max_frames]
+                alive = self.process(chunk, ratio, source) and alive
+                if valid is None and self.valid < len(chunk):
+                    valid = start + self.valid
+            self.valid = frames if valid is None else valid
+            return alive
+
+        ratio = min(max(ratio, 0.0), self.max_ratio)
+        pos = self._pos[:frames]
+        np.multiply(self._ramp[:frames], ratio, out=pos)
+        pos += self._frac
+        return self._interpolate(out, pos, self._frac + ratio * frames, source)
+
+    def process_rates(self, out, rates, source):
+        """Like `process`, but with a per-sample float64 rate (at most max_frames long)."""
+        frames = len(out)
+        np.clip(rates, 0.0, self.max_ratio, out=rates)
+        pos = self._pos[:frames]
+        np.cumsum(rates, out=pos)
+        end = self._frac + pos[-1]
+        pos -= rates  # position of each output frame is the sum of the rates before it
+        pos += self._frac
+        return self._interpolate(out, pos, end, source)
+
+    def _interpolate(self, out, pos, end, source):
+        frames = len(out)
+        alive = True
+        need = int(end) + 2
+        if need > self._avail:
+            got = source.read_into(self._in[self._avail:need])
+            if got < need - self._avail:
+                self._in[self._avail + got:need] = 0.0
+                alive = not source.exhausted
+                if not alive and self._real is None:
+                    self._real = self._avail + got
+            self._avail = need
+        if self._real is None:
+            self.valid = frames
+        else:
+            # Frames up to and including the one at the last real sample
+            self.valid = int(np.searchsorted(pos, self._real - 1, side="right"))
+
+        floor = self._floor[:frames]
+        idx = self._idx[:frames]
+        idx1 = self._idx1[:frames]
+        a = self._a[:frames]
+        b = self._b[:frames]
+        w = self._w[:frames]
+        np.floor(pos, out=floor)
+        np.copyto(idx, floor, casting="unsafe")
+        np.add(idx, 1, out=idx1)
+        np.subtract(pos, floor, out=pos)
+        np.copyto(w, pos, casting="same_kind")  # interpolation weights
+        np.take(self._in, idx, out=a, mode="clip")
+        np.take(self._in, idx1, out=b, mode="clip")
+        np.subtract(b, a, out=b)
+        np.multiply(b, w, out=b)
+        np.add(a, b, out=out)
+
+        advance = int(end)
+        self.position += end - self._frac
+        self._frac = end - advance
+        keep = self._avail - advance
+        self._in[:keep] = self._in[advance:self._avail]
+        self._avail = keep
+        if self._real is not None:
+            self._real -= advance
+        return alive
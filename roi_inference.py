@@ -0,0 +1,102 @@
+import time
+import numpy as np
+
+
+class RoiHandDetector:
+    """Runs a hands model on a padded crop around the hands it saw last frame.
+
+    Wraps anything with a MediaPipe-style `process(rgb)` and is used in its
+    place. The crop is the union of the previous hands' bounding boxes plus
+    `padding`; it only moves when a hand gets close to its edge so the model
+    sees stable geometry. The crop (or full frame) is also downscaled by a
+    factor that adapts to keep inference inside `budget` seconds. When no hand
+    is found in the crop, or every `refresh_every` frames, the full frame is
+    searched again so new or lost hands are picked up.
+
+    Landmarks in the returned result are remapped to full-frame normalized
+    coordinates, so callers cannot tell the difference.
+    """
+
+    def __init__(self, hands, budget=0.015, padding=0.35, min_scale=0.35, min_side=128,
+                 refresh_every=30):
+        self.hands = hands
+        self.budget = budget
+        self.padding = padding
+        self.min_scale = min_scale
+        self.min_side = min_side
+        self.refresh_every = refresh_every
+        self.scale = 1.0
+        self.roi = None  # (x0, y0, x1, y1) in pixels
+        self.last_mode = "full"
+        self._avg_time = 0.0
+        self._frames_since_full = 0
+
+    def process(self, rgb):
+        h, w = rgb.shape[:2]
+        if self.roi is not None and self._frames_since_full < self.refresh_every:
+            result = self._run(rgb, self.roi, w, h)
+            self._frames_since_full += 1
+            self.last_mode = "roi"
+            if result.multi_hand_landmarks:
+                self._update_roi(result, w, h)
+                return result
+        # Tracking lost (or due for a refresh): search the whole frame
+        result = self._run(rgb, (0, 0, w, h), w, h)
+        self._frames_since_full = 0
+        self.last_mode = "full"
+        if result.multi_hand_landmarks:
+            self._update_roi(result, w, h, force=True)
+        else:
+            self.roi = None
+        return result
+
+    def close(self):
+        if hasattr(self.hands, "close"):
+            self.hands.close()
+
+    def _run(self, rgb, roi, w, h):
+        x0, y0, x1, y1 = roi
+        crop = rgb if (x0, y0, x1, y1) == (0, 0, w, h) else rgb[y0:y1, x0:x1]
+        cw, ch = x1 - x0, y1 - y0
+        scale = max(self.scale, self.min_side / max(min(cw, ch), 1))
+        if scale < 1.0:
+            import cv2  # imported where used, so importing this module stays cheap
+            crop = cv2.resize(crop, (max(int(cw * scale), 1), max(int(ch * scale), 1)),
+                              interpolation=cv2.INTER_AREA)
+        else:
+            crop = np.ascontiguousarray(crop)
+
+        started = time.perf_counter()
+        result = self.hands.process(crop)
+        self._adapt(time.perf_counter() - started)
+
+        if result.multi_hand_landmarks and crop is not rgb:
+            for hand_landmarks in result.multi_hand_landmarks:
+                for lm in hand_landmarks.landmark:
+                    lm.x = (x0 + lm.x * cw) / w
+                    lm.y = (y0 + lm.y * ch) / h
+                    lm.z = lm.z * cw / w
+        return result
+
+    def _adapt(self, elapsed):
+        self._avg_time = 0.8 * self._avg_time + 0.2 * elapsed if self._avg_time else elapsed
+        if self._avg_time > self.budget:
+            self.scale = max(self.min_scale, round(self.scale - 0.05, 2))
+        elif self._avg_time < 0.6 * self.budget:
+            self.scale = min(1.0, round(self.scale + 0.05, 2))
+
+    def _update_roi(self, result, w, h, force=False):
+        xs = np.array([lm.x for hand in result.multi_hand_landmarks for lm in hand.landmark]) * w
+        ys = np.array([lm.y for hand in result.multi_hand_landmarks for lm in hand.landmark]) * h
+        bx0, by0, bx1, by1 = xs.min(), ys.min(), xs.max(), ys.max()
+        if not force and self.roi is not None:
+            # Keep the crop while the hands sit comfortably inside it
+            x0, y0, x1, y1 = self.roi
+            margin_x, margin_y = 0.1 * (x1 - x0), 0.1 * (y1 - y0)
+            inside = bx0 > x0 + margin_x and by0 > y0 + margin_y and bx1 < x1 - margin_x and by1 < y1 - margin_y
+            oversized = (x1 - x0) * (y1 - y0) > 4 * max((bx1 - bx0) * (by1 - by0), 1.0)
+            if inside and not oversized:
+                return
+        pad = self.padding * max(bx1 - bx0, by1 - by0, 0.1 * min(w, h))
+        self.roi = (int(max(0, bx0 - pad)), int(max(0, by0 - pad)),
+                    int(min(w, bx1 + pad)), int(min(h, by1 + pad)))
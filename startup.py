@@ -0,0 +1,114 @@
+import time
+import logging
+import threading
+import numpy as np
+
+# Reference point for startup timings: when the app first imported this module
+_process_start = time.perf_counter()
+TAKE_TIMEOUT = 5.0  # seconds the tracking window waits for the warm-up before opening the camera itself
+
+
+class StartupTimer:
+    """Milestones (seconds since launch) from app start to the first tracked frame."""
+
+    def __init__(self, start=None):
+        self.start = _process_start if start is None else start
+        self.marks = {}
+
+    def mark(self, name):
+        """Record `name` once; later calls keep the first time."""
+        self.marks.setdefault(name, time.perf_counter() - self.start)
+        return self.marks[name]
+
+    def report(self):
+        lines = [f"{'milestone':<20}{'t (s)':>8}"]
+        for name, seconds in sorted(self.marks.items(), key=lambda item: item[1]):
+            lines.append(f"{name:<20}{seconds:>8.3f}")
+        return "\n".join(lines)
+
+
+class Prewarmer:
+    """Opens the camera and builds the hands model in the background.
+
+    Started while the mode screen is up, so by the time songs are picked the
+    camera is streaming and MediaPipe has already run one inference (its
+    first call is several times slower than the rest). `take()` hands the
+    ready capture and model over to the HandTracker. With `inference_process`
+    the model is a RemoteHands worker process, warmed up the same way.
+    """
+
+    def __init__(self, camera_index=0, timer=None, inference_process=False):
+        self.camera_index = camera_index
+        self.inference_process = inference_process
+        self.timer = timer or StartupTimer()
+        self.capture = None
+        self.hands = None
+        self.error = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._abandoned = False  # take() gave up waiting; release whatever is still produced
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="prewarm", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            import cv2
+            from landmarks import create_hands
+
+            self.capture = cv2.VideoCapture(self.camera_index)
+            ret, frame = self.capture.read()
+            self.timer.mark("camera_open")
+            if self.inference_process:
+                from inference_worker import RemoteHands
+                self.hands = RemoteHands()
+                self.hands.start()
+            else:
+                self.hands = create_hands()
+            self.timer.mark("hands_model")
+            if not ret:
+                frame = np.zeros((480, 640, 3), dtype=np.uint8)
+            self.hands.process(cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB))
+            self.timer.mark("warmup_inference")
+        except Exception as e:
+            self.error = e
+            logging.warning(f"Prewarm failed ({e}); the tracker will open the camera itself.")
+        finally:
+            with self._lock:
+                self._ready.set()
+                abandoned = self._abandoned
+            if abandoned:
+                self._release(*self.take())
+
+    def take(self, timeout=None):
+        """Wait for the warm-up and return (capture, hands); either may be None.
+
+        If the warm-up is not done within `timeout` (e.g. the camera open
+        hangs), (None, None) is returned and whatever it produces later is
+        released, so the caller can open its own.
+        """
+        ready = self._ready.wait(timeout)
+        with self._lock:
+            if not ready and not self._ready.is_set():
+                self._abandoned = True
+                return None, None
+            capture, hands = self.capture, self.hands
+            self.capture = self.hands = None
+        return capture, hands
+
+    def close(self):
+        """Release whatever was not taken (e.g. the app quit on the mode screen)."""
+        self._release(*self.take(timeout=5.0))
+
+    @staticmethod
+    def _release(capture, hands):
+        if capture is not None:
+            capture.release()
+        if hands is not None:
+            hands.close()
+
+
+# Global instance
+timer = StartupTimer()
@@ -0,0 +1,143 @@
+import numpy as np
+
+FRAME = 1024  # WSOLA frame length (~23 ms at 44.1 kHz)
+HOP = FRAME // 2  # synthesis hop; a periodic Hann window sums to 1 at 50% overlap
+TOLERANCE = 256  # how far (in samples) a frame may move to line up with the previous one
+
+
+class WsolaStretcher:
+    """Pitch-preserving tempo change (WSOLA) over a resampled streaming source.
+
+    Input comes from `resampler` at the fixed sample-rate `ratio`, so it is
+    at the engine rate. Every output hop overlap-adds one Hann-windowed frame
+    taken near the nominal analysis position (advanced by tempo * HOP per
+    hop); within +-TOLERANCE the frame that best continues the previous one
+    is chosen by normalized cross-correlation, computed for all candidate
+    offsets in one np.correlate call, with candidate energies from a running
+    sum of squares. Buffers are allocated here; per hop only the small
+    correlation result is.
+
+    `valid` is how many frames of the last `process` call came from the
+    track (the rest is silence after its end); `position` is the playback
+    position in source frames.
+    """
+
+    def __init__(self, ratio, max_tempo=2.0, frame=FRAME, tolerance=TOLERANCE):
+        self.ratio = ratio
+        self.max_tempo = max_tempo
+        self.frame = frame
+        self.hop = frame // 2
+        self.overlap = frame - self.hop
+        self.tolerance = tolerance
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame) / frame)).astype(np.float32)
+        search = 2 * tolerance + self.overlap
+        # Input history: the previous frame, plus the search span ahead of the next analysis position
+        capacity = 2 * (frame + 2 * tolerance + int(np.ceil(max_tempo * self.hop))) + search
+        self._x = np.zeros(capacity, dtype=np.float32)
+        self._acc = np.zeros(frame, dtype=np.float32)
+        self._ready = np.zeros(self.hop, dtype=np.float32)
+        self._corr = np.zeros(2 * tolerance + 1, dtype=np.float32)
+        self._energy = np.zeros(2 * tolerance + 1, dtype=np.float64)
+        self._score = np.zeros(2 * tolerance + 1, dtype=np.float64)
+        self._span_sq = np.zeros(search, dtype=np.float64)
+        self._squares = np.zeros(search + 1, dtype=np.float64)
+        self._grain = np.zeros(frame, dtype=np.float32)
+        self.reset()
+
+    def reset(self, position=0.0):
+        """Start over at source frame `position` (after a seek or when the mode is switched on)."""
+        self.origin = float(position)
+        # Input index i holds source frame origin + (i - tolerance) * ratio; the first
+        # `tolerance` samples are silence so the first search window has room before it
+        self._x[:self.tolerance] = 0.0
+        self._base = 0  # absolute input index of self._x[0]
+        self._filled = self.tolerance  # absolute input index one past the last buffered sample
+        self._analysis = float(self.tolerance)  # nominal position of the next frame
+        self._previous = None  # where the last frame was taken from
+        self._end = None  # absolute input index where the track ran out
+        self._ready_pos = self._ready_end = self.hop  # nothing ready yet
+        self._acc.fill(0)
+        self.valid = 0
+
+    @property
+    def position(self):
+        played = self._previous if self._previous is not None else self._analysis - self.tolerance
+        return self.origin + max(played - self.tolerance, 0.0) * self.ratio
+
+    def process(self, out, rates, resampler, source):
+        """Write len(out) frames at the tempo in `rates` (per output frame); False once the track is over."""
+        frames = len(out)
+        written = 0
+        self.valid = frames
+        while written < frames:
+            if self._ready_pos >= self._ready_end:
+                if self._ready_end < self.hop:
+                    # The track ended inside the last hop
+                    out[written:] = 0.0
+                    self.valid = written
+                    return False
+                self._next_hop(float(rates[written]), resampler, source)
+                continue
+            n = min(frames - written, self._ready_end - self._ready_pos)
+            out[written:written + n] = self._ready[self._ready_pos:self._ready_pos + n]
+            self._ready_pos += n
+            written += n
+        return True
+
+    def _next_hop(self, tempo, resampler, source):
+        tolerance, frame, hop, overlap = self.tolerance, self.frame, self.hop, self.overlap
+        lo = int(self._analysis) - tolerance
+        self._fill(lo + 2 * tolerance + frame, resampler, source)
+        x = self._x
+        offset = lo - self._base
+
+        if self._previous is None:
+            start = lo + tolerance
+        else:
+            # Candidates whose first `overlap` samples best continue the previous frame
+            natural = self._previous + hop - self._base
+            template = x[natural:natural + overlap]
+            span = x[offset:offset + 2 * tolerance + overlap]
+            self._corr[:] = np.correlate(span, template, "valid")
+            # Energy of every candidate from one running sum of squares
+            squares = self._squares
+            squares[0] = 0.0
+            np.multiply(span, span, out=self._span_sq)
+            np.cumsum(self._span_sq, out=squares[1:])
+            np.subtract(squares[overlap:], squares[:-overlap], out=self._energy)
+            self._energy += 1e-9
+            np.sqrt(self._energy, out=self._energy)
+            np.divide(self._corr, self._energy, out=self._score)
+            start = lo + int(np.argmax(self._score))
+
+        grain = self._grain
+        source_frame = x[start - self._base:start - self._base + frame]
+        np.multiply(source_frame, self.window, out=grain)
+        if self._previous is None:
+            grain[:hop] = source_frame[:hop]  # nothing to overlap yet: start at full level, not faded in
+        self._acc += grain
+        self._ready[:] = self._acc[:hop]
+        self._acc[:overlap] = self._acc[hop:]
+        self._acc[overlap:] = 0.0
+        self._ready_pos = 0
+        # The hop just made plays source input from `start`; cut it where the track ends
+        self._ready_end = hop if self._end is None else int(min(max(self._end - start, 0), hop))
+        self._previous = start
+        self._analysis += min(max(tempo, 0.0), self.max_tempo) * hop
+
+    def _fill(self, needed, resampler, source):
+        """Make input up to absolute index `needed` available, dropping what is no longer used."""
+        keep_from = int(self._analysis) - self.tolerance
+        if self._previous is not None:
+            keep_from = min(keep_from, self._previous + self.hop)
+        drop = keep_from - self._base
+        if drop > 0 and needed - self._base > len(self._x):
+            count = self._filled - keep_from
+            self._x[:count] = self._x[drop:drop + count]
+            self._base = keep_from
+        while self._filled < needed:
+            start = self._filled - self._base
+            n = min(needed - self._filled, resampler.max_frames)
+            if not resampler.process(self._x[start:start + n], self.ratio, source) and self._end is None:
+                self._end = self._filled + resampler.valid
+            self._filled += n
@@ -0,0 +1,164 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import soundfile as sf
+import pcm_cache
+
+BASE_FRAMES = 256  # frames per bucket at the finest level
+FACTOR = 4  # each level merges this many buckets of the one below
+MIN_BUCKETS = 64  # coarsest level kept
+CHUNK_FRAMES = BASE_FRAMES * 4096
+
+
+class WaveformIndex:
+    """Peak and RMS of a track at several resolutions.
+
+    Level 0 has one bucket per BASE_FRAMES samples; every level above merges
+    FACTOR buckets. Drawing any span of the track then touches at most a few
+    buckets per pixel column, whatever the zoom.
+    """
+
+    def __init__(self, samplerate, frames, peaks, rms):
+        self.samplerate = samplerate
+        self.frames = frames
+        self.peaks = peaks  # list of float32 arrays, finest first
+        self.rms = rms
+
+    @classmethod
+    def build(cls, chunks, samplerate):
+        """Build from an iterable of mono float32 chunks (lengths multiples of BASE_FRAMES but the last)."""
+        peak_parts, square_parts = [], []
+        frames = 0
+        for chunk in chunks:
+            frames += len(chunk)
+            pad = -len(chunk) % BASE_FRAMES
+            if pad:
+                chunk = np.concatenate([chunk, np.zeros(pad, dtype=np.float32)])
+            buckets = chunk.reshape(-1, BASE_FRAMES)
+            peak_parts.append(np.abs(buckets).max(axis=1))
+            square_parts.append(np.einsum("ij,ij->i", buckets, buckets) / BASE_FRAMES)
+        peak = np.concatenate(peak_parts) if peak_parts else np.zeros(1, dtype=np.float32)
+        square = np.concatenate(square_parts) if square_parts else np.zeros(1, dtype=np.float32)
+
+        peaks, squares = [peak.astype(np.float32)], [square.astype(np.float32)]
+        while len(peaks[-1]) > MIN_BUCKETS * FACTOR:
+            pad = -len(peaks[-1]) % FACTOR
+            peak = np.pad(peaks[-1], (0, pad)).reshape(-1, FACTOR)
+            square = np.pad(squares[-1], (0, pad)).reshape(-1, FACTOR)
+            peaks.append(peak.max(axis=1))
+            squares.append(square.mean(axis=1, dtype=np.float32))
+        return cls(samplerate, frames, peaks, [np.sqrt(s) for s in squares])
+
+    def save(self, path):
+        arrays = {f"peak{i}": p for i, p in enumerate(self.peaks)}
+        arrays.update({f"rms{i}": r for i, r in enumerate(self.rms)})
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, samplerate=self.samplerate, frames=self.frames, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            levels = sum(1 for name in data.files if name.startswith("peak"))
+            return cls(int(data["samplerate"]), int(data["frames"]),
+                       [data[f"peak{i}"] for i in range(levels)], [data[f"rms{i}"] for i in range(levels)])
+
+    def window(self, start, end, columns):
+        """(peak, rms) per column for the span `start`..`end` seconds; 0 outside the track."""
+        frames_per_column = max((end - start) * self.samplerate / max(columns, 1), 1e-9)
+        level = 0
+        while (level + 1 < len(self.peaks)
+               and BASE_FRAMES * FACTOR ** (level + 1) <= frames_per_column):
+            level += 1
+        bucket = BASE_FRAMES * FACTOR ** level
+        peaks, rms = self.peaks[level], self.rms[level]
+        n = len(peaks)
+
+        edges = np.floor((start * self.samplerate + np.arange(columns + 1) * frames_per_column) / bucket)
+        edges = edges.astype(np.int64)
+        lo = np.clip(edges[:-1], 0, n - 1)
+        stop = int(min(max(edges[-1], lo[-1] + 1), n))
+        # Widest value inside each column (a column narrower than a bucket repeats it)
+        peak_out = np.maximum.reduceat(peaks[:stop], lo)
+        rms_out = np.maximum.reduceat(rms[:stop], lo)
+        outside = (edges[:-1] < 0) | (edges[:-1] >= n)
+        peak_out[outside] = 0.0
+        rms_out[outside] = 0.0
+        return peak_out, rms_out
+
+
+def _decoded_chunks(path, cache):
+    """Mono samples of `path`, from the PCM cache when possible, in CHUNK_FRAMES pieces."""
+    hit = cache.lookup(path)
+    if hit is not None:
+        data, meta = hit
+        return (data[i:i + CHUNK_FRAMES] for i in range(0, len(data), CHUNK_FRAMES)), meta["samplerate"]
+    return _decode_chunks(path), sf.info(path).samplerate
+
+
+def _decode_chunks(path):
+    # Read until a short read: sf.info can overstate an MP3's length, and
+    # sf.blocks pads a short final block with stale samples
+    with sf.SoundFile(path) as f:
+        buffer = np.empty((CHUNK_FRAMES, f.channels), dtype=np.float32)
+        while True:
+            block = f.read(CHUNK_FRAMES, dtype="float32", always_2d=True, out=buffer)
+            if len(block):
+                yield block.mean(axis=1, dtype=np.float32)
+            if len(block) < CHUNK_FRAMES:
+                return
+
+
+class WaveformStore:
+    """Builds, caches on disk and hands out WaveformIndex objects.
+
+    `get()` never blocks: it returns None and schedules a background build
+    (or disk load) the first time a track is asked for.
+    """
+
+    def __init__(self, root=None, cache=None):
+        self.root = os.path.join(root or pcm_cache.DEFAULT_CACHE_DIR, "waveform")
+        self.cache = cache or pcm_cache.cache
+        self._indexes = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="waveform")
+
+    def get(self, path):
+        if path is None:
+            return None
+        index = self._indexes.get(path)
+        if index is None:
+            with self._lock:
+                if path not in self._pending:
+                    self._pending.add(path)
+                    self._executor.submit(self._load_or_build, path)
+        return index
+
+    def build_now(self, path):
+        """Load or build the index for `path` in the calling thread."""
+        self._load_or_build(path)
+        return self._indexes.get(path)
+
+    def _load_or_build(self, path):
+        try:
+            index_path = os.path.join(self.root, self.cache.key(path) + ".npz")
+            try:
+                index = WaveformIndex.load(index_path)
+            except (OSError, ValueError, KeyError):
+                chunks, samplerate = _decoded_chunks(path, self.cache)
+                index = WaveformIndex.build(chunks, samplerate)
+                try:
+                    os.makedirs(self.root, exist_ok=True)
+                    index.save(index_path)
+                except OSError as e:
+                    logging.warning(f"Could not cache waveform for {path}: {e}")
+            self._indexes[path] = index
+        except Exception as e:
+            logging.warning(f"Waveform for {path} unavailable: {e}")
+
+
+# Global instance
+waveforms = WaveformStore()